@@ -8,12 +8,14 @@ import matplotlib.ticker as ticker
 import matplotlib.animation as animation
 import seaborn as sns
 import os
-import shutil
 import math
 
 from scipy.stats import pareto
 
 from data import CitiesData, TreesData, BooksData, SmallBodiesData
+from utils.pareto_tail import pareto_tail_p_value, select_x_min
+from utils.cache import DiskCache
+from utils.figure_export import FigureExporter
 
 # %%
 # Output Directory Setup
@@ -21,17 +23,12 @@ from data import CitiesData, TreesData, BooksData, SmallBodiesData
 #region
 OUTPUT_DIRECTORY = 'out/auxiliary'
 
-if os.path.exists(OUTPUT_DIRECTORY):
-	shutil.rmtree(OUTPUT_DIRECTORY)
- 
-os.makedirs(OUTPUT_DIRECTORY)
-
-plt_cnt = 0
+# PNGs are encoded in the background, numbered in save order. Cells guarded by
+# exporter.restore reuse their previous figure while their code and data are unchanged.
+exporter = FigureExporter(OUTPUT_DIRECTORY, cache=DiskCache('cache/figures', max_bytes=1024**3))
 
 def save_fig(plt, name):
-	global plt_cnt
-	plt.savefig(f'{OUTPUT_DIRECTORY}/{plt_cnt}_{name}')
-	plt_cnt += 1
+	exporter.save(plt.gcf(), name)
 #endregion
 # %%
 # Plot notator wrapper function
@@ -210,10 +207,38 @@ notate_plot(plt, data_source="kaggle.com/datasets/mdhamani/goodreads-books-100k"
 # Save
 save_fig(plt, 'book_pages.png')
 
+# %%
+# Pareto tails of the auxiliary datasets
+#================================================================
+#region
+auxiliary_samples = {
+	'Small body diameter': small_bodies_df['diameter'],
+	'City population': cities_df['population'],
+	'Tree diameter': trees_df['DIA'],
+	'Book pages': books_df['pages'],
+}
+
+tail_fits = []
+for name, values in auxiliary_samples.items():
+	sorted_values = np.sort(values.dropna().to_numpy(dtype=float))
+	# Log-spaced candidate lower bounds between the smallest positive value and the 99.9th percentile
+	positive_values = sorted_values[sorted_values > 0]
+	x_min_candidates = np.logspace(np.log10(positive_values[0]), np.log10(np.percentile(positive_values, 99.9)), 200)
+
+	best_tail, _ = select_x_min(sorted_values, x_min_candidates)
+	p_value, _ = pareto_tail_p_value(sorted_values, best_tail, x_min_candidates, n_replicates=100, seed=0)
+	tail_fits.append({'Dataset': name, 'x_min': best_tail['threshold'], 'alpha': best_tail['alpha'], 'Tail size': best_tail['n_tail'], 'KS': best_tail['KS'], 'p': p_value})
+
+print(pd.DataFrame(tail_fits).to_string(index=False))
+#endregion
+
 # %%
 from PIL import Image
 import matplotlib.pyplot as plt
 
+# The saved figures are read back below
+exporter.flush()
+
 # Load the images
 img1 = Image.open("./out/auxiliary/0_mass_solar_system.png")
 img2 = Image.open("./out/auxiliary/1_cities_dist.png")
@@ -0,0 +1,98 @@
+import contextlib
+import io
+import itertools
+import statistics
+import time
+
+class Benchmark:
+	"""
+	A timed function, run once for every combination of its parameters.
+
+	Parameters
+	----------
+	name : str
+		Name of the benchmark.
+	function : callable
+		Timed function, called with the keyword arguments returned by `setup`.
+	params : dict
+		Parameter name to the list of its values, e.g. {'n': [10**3, 10**4]}.
+	setup : callable, optional
+		Called with one value of every parameter, untimed. Returns the keyword arguments of `function`.
+		Defaults to passing the parameters through.
+	repeat : int
+		Number of timed samples.
+	"""
+
+	def __init__(self, name, function, params, setup, repeat):
+		self.name = name
+		self.function = function
+		self.params = params
+		self.setup = setup
+		self.repeat = repeat
+
+	def cases(self, quick=False):
+		"""
+		Every combination of the parameters, only the two smallest values of each if `quick`.
+		"""
+		names = list(self.params)
+		values = [self.params[name][:2] if quick else self.params[name] for name in names]
+		return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+	def run(self, params, min_sample_time=0.05):
+		"""
+		Times the function for one combination of the parameters.
+
+		Calls are grouped so that one sample lasts at least `min_sample_time`, as `timeit.Timer.autorange`
+		does, and the first group also serves as a warm-up.
+
+		Returns
+		-------
+		dict
+			Seconds per call over the samples: 'min', 'median', 'mean' and 'stdev', with the number of calls
+			per sample and of samples.
+		"""
+		# The loaders print progress messages
+		with contextlib.redirect_stdout(io.StringIO()):
+			arguments = self.setup(**params) if self.setup is not None else params
+
+			number = 1
+			while True:
+				elapsed = self._time(arguments, number)
+				if elapsed >= min_sample_time or number >= 1_000_000:
+					break
+				number *= 10
+
+			samples = [elapsed / number] + [self._time(arguments, number) / number for _ in range(self.repeat - 1)]
+
+		return {
+			'number': number,
+			'repeat': len(samples),
+			'min': min(samples),
+			'median': statistics.median(samples),
+			'mean': statistics.fmean(samples),
+			'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+		}
+
+	def _time(self, arguments, number):
+		start = time.perf_counter()
+		for _ in range(number):
+			self.function(**arguments)
+		return time.perf_counter() - start
+
+# Registered benchmarks by name, in definition order
+BENCHMARKS = {}
+
+def benchmark(params=None, setup=None, repeat=5):
+	"""
+	Decorator registering a function as a benchmark, see `Benchmark`.
+
+		@benchmark(params={'n': [10**3, 10**4]}, setup=lambda n: {'x': np.random.rand(n)})
+		def sort(x):
+			np.sort(x)
+	"""
+	def register(function):
+		if function.__name__ in BENCHMARKS:
+			raise ValueError(f"Benchmark {function.__name__} is already defined.")
+		BENCHMARKS[function.__name__] = Benchmark(function.__name__, function, params or {}, setup, repeat)
+		return function
+	return register
@@ -0,0 +1,129 @@
+"""
+Runs the benchmark suite and writes the results of the current commit.
+
+	python -m benchmarks.run
+	python -m benchmarks.run --quick --filter dagum
+	python -m benchmarks.run --compare benchmarks/results/<commit>.json
+
+Results are written to benchmarks/results/<commit>.json, with the seconds per call of every benchmark
+and parameter combination and the versions of the machine and libraries. Comparing with an earlier
+result prints the ratio of the median times and flags regressions.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+import scipy
+from benchmarks.harness import BENCHMARKS
+import benchmarks.suite  # noqa: F401, registers the benchmarks
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def git_commit():
+	"""
+	Hash of the checked out commit and whether the tree has uncommitted changes.
+	"""
+	try:
+		commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+		status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout
+	except (OSError, subprocess.CalledProcessError):
+		return 'unknown', True
+	return commit, bool(status.strip())
+
+def machine():
+	return {
+		'platform': platform.platform(),
+		'processor': platform.processor(),
+		'cpu_count': os.cpu_count(),
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'pandas': pd.__version__,
+		'scipy': scipy.__version__,
+		'matplotlib': matplotlib.__version__,
+	}
+
+def run(names, quick=False):
+	"""
+	Runs benchmarks by name, printing each result as it finishes.
+
+	Returns
+	-------
+	list of dict
+		One entry per benchmark and parameter combination.
+	"""
+	results = []
+	for name in names:
+		bench = BENCHMARKS[name]
+		for params in bench.cases(quick):
+			result = {'name': name, 'params': params, **bench.run(params)}
+			results.append(result)
+			print(f'{name:<24}{format_params(params):<32}{result["median"] * 1e3:>12.3f} ms  (±{result["stdev"] * 1e3:.3f}, {result["repeat"]}x{result["number"]})', flush=True)
+	return results
+
+def format_params(params):
+	return ', '.join(f'{key}={value:g}' if isinstance(value, (int, float)) else f'{key}={value}' for key, value in params.items())
+
+def compare(results, baseline_path, threshold=1.2):
+	"""
+	Prints the ratio of the median times to those of a baseline result file.
+
+	Ratios above `threshold` are flagged as regressions, below its inverse as improvements.
+	"""
+	with open(baseline_path) as file:
+		baseline = json.load(file)
+	baseline_medians = {(entry['name'], json.dumps(entry['params'], sort_keys=True)): entry['median'] for entry in baseline['results']}
+
+	print(f'\nCompared with {baseline["commit"][:12]}:')
+	for entry in results:
+		baseline_median = baseline_medians.get((entry['name'], json.dumps(entry['params'], sort_keys=True)))
+		if baseline_median is None:
+			continue
+		ratio = entry['median'] / baseline_median
+		flag = 'slower' if ratio > threshold else 'faster' if ratio < 1 / threshold else ''
+		print(f'{entry["name"]:<24}{format_params(entry["params"]):<32}{ratio:>8.2f}x  {flag}')
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='benchmarks.run', description='Runs the benchmark suite.')
+	parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this text.')
+	parser.add_argument('--quick', action='store_true', help='Only the two smallest values of every parameter.')
+	parser.add_argument('--compare', metavar='RESULTS', help='Result file of an earlier commit to compare with.')
+	parser.add_argument('--output', help='Result file to write. Defaults to benchmarks/results/<commit>.json.')
+	parser.add_argument('--list', action='store_true', help='List the benchmarks and their parameters.')
+	args = parser.parse_args(argv)
+
+	names = [name for name in BENCHMARKS if args.filter in name]
+	if args.list:
+		for name in names:
+			print(f'{name:<24}{BENCHMARKS[name].params}')
+		return 0
+
+	commit, dirty = git_commit()
+	results = run(names, args.quick)
+
+	output = args.output or os.path.join(RESULTS_DIRECTORY, f'{commit}{"-dirty" if dirty else ""}.json')
+	os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+	with open(output, 'w') as file:
+		json.dump({
+			'commit': commit,
+			'dirty': dirty,
+			'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+			'quick': args.quick,
+			'machine': machine(),
+			'results': results,
+		}, file, indent=1)
+	print(f'\nResults written to {output}')
+
+	if args.compare:
+		compare(results, args.compare)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,145 @@
+import atexit
+import contextlib
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from benchmarks.harness import benchmark
+from data import FedData, PSIDData
+from utils.dagum_generalized import DagumGeneralNetWealth
+from utils.figure_export import FigureExporter
+from utils.helper import calculate_percentiles
+from utils.pareto_tail import pareto_tail_scan, select_x_min
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dagum fit of the 2019 PSID wave in millions, recorded in test_dagum.py
+DAGUM_PARAMS = (2.03783141e-01, 8.73657266e-02, 9.90708208e+00, 8.81972201e+03, 6.84661991e-01, 2.48950254e-02, 8.96540606e+00)
+DAGUM_INITIAL_PARAMS = (0.0562, 0.9, 3.422, 9463.85, 0.677, 9.807, 9.1823)
+
+SAMPLE_SIZES = [10**3, 10**4, 10**5, 10**6]
+
+def dagum_sample(n, seed=0):
+	# Net worth in millions drawn from the fitted Dagum, negative values, zeros and a heavy tail included
+	return DagumGeneralNetWealth().ppf(np.random.default_rng(seed).uniform(size=n), *DAGUM_PARAMS)
+
+@contextlib.contextmanager
+def working_directory(path):
+	# The loaders read from paths relative to the repository
+	previous = os.getcwd()
+	os.chdir(path)
+	try:
+		yield
+	finally:
+		os.chdir(previous)
+
+#%%
+# Loaders
+#================================================================
+#region
+def psid_files(households):
+	# A copy of the PSID layout with every wave filled by `households` sampled households
+	root = tempfile.mkdtemp(prefix='psid_benchmark_')
+	atexit.register(shutil.rmtree, root, True)
+	os.makedirs(os.path.join(root, 'data', 'PSID'))
+	labels_path = os.path.join(root, 'data', 'PSID', 'data_labels.txt')
+	shutil.copy(os.path.join(REPOSITORY, 'data', 'PSID', 'data_labels.txt'), labels_path)
+
+	with open(labels_path) as file:
+		variables = PSIDData().parse_to_dict(file.readlines())
+	rng = np.random.default_rng(0)
+	columns = {}
+	for variable, label in variables.items():
+		if 'INTERVIEW' in label:
+			columns[variable] = np.arange(1, households + 1)
+		elif 'WEALTH' in label:
+			columns[variable] = np.round(dagum_sample(households, rng.integers(2**32)) * 1_000_000)
+		elif '# IN FU' in label:
+			columns[variable] = rng.integers(1, 7, households)
+		else:
+			columns[variable] = 1
+	pd.DataFrame(columns).to_csv(os.path.join(root, 'data', 'PSID', 'household-wealth-data.csv'), index=False)
+	return {'root': root}
+
+@benchmark(params={'households': [10**4, 10**5]}, setup=psid_files, repeat=3)
+def psid_load(root):
+	with working_directory(root):
+		PSIDData().load(cpi_adjust=False, equivalence_scale_adjust=True, target_year=2019)
+
+@benchmark(repeat=5)
+def fed_load():
+	with working_directory(REPOSITORY):
+		FedData().load()
+#endregion
+
+#%%
+# Percentiles
+#================================================================
+#region
+@benchmark(params={'n': SAMPLE_SIZES, 'granularity': [1, 0.01]}, setup=lambda n, granularity: {'data': pd.DataFrame({'Wealth': dagum_sample(n)}), 'granularity': granularity})
+def percentiles(data, granularity):
+	calculate_percentiles(data, 'Wealth', granularity)
+#endregion
+
+#%%
+# Dagum Generalized model
+#================================================================
+#region
+def dagum_setup(n):
+	return {'model': DagumGeneralNetWealth(), 'x': dagum_sample(n)}
+
+@benchmark(params={'n': SAMPLE_SIZES}, setup=dagum_setup)
+def dagum_pdf(model, x):
+	model.pdf(x, *DAGUM_PARAMS)
+
+@benchmark(params={'n': SAMPLE_SIZES}, setup=dagum_setup)
+def dagum_cdf(model, x):
+	model.cdf(x, *DAGUM_PARAMS)
+
+@benchmark(params={'n': SAMPLE_SIZES}, setup=dagum_setup)
+def dagum_log_likelihood(model, x):
+	model.log_likelihood(DAGUM_PARAMS, x)
+
+@benchmark(params={'n': [10**3, 10**4], 'maxiter': [50]}, setup=lambda n, maxiter: {**dagum_setup(n), 'maxiter': maxiter}, repeat=3)
+def dagum_fit(model, x, maxiter):
+	# A fixed number of iterations of the optimizer behind `fit`, which raises when they run out
+	model._minimize(x, DAGUM_INITIAL_PARAMS, options={'disp': False, 'maxiter': maxiter})
+#endregion
+
+#%%
+# Pareto tail
+#================================================================
+#region
+def sorted_wealth(n):
+	return {'sorted_data': np.sort(dagum_sample(n) * 1_000_000)}
+
+@benchmark(params={'n': SAMPLE_SIZES}, setup=sorted_wealth)
+def pareto_scan(sorted_data):
+	# The x_m sweep of the pt3 Pareto CDF animation
+	pareto_tail_scan(sorted_data, np.logspace(0, np.log10(5_000_000), 600), upper=100_000_000)
+
+@benchmark(params={'n': SAMPLE_SIZES}, setup=sorted_wealth)
+def pareto_x_min(sorted_data):
+	select_x_min(sorted_data, np.logspace(0, 8, 400), upper=100_000_000)
+#endregion
+
+#%%
+# Figure export
+#================================================================
+#region
+def figure_setup(points, dpi):
+	fig, ax = plt.subplots(figsize=(14, 8))
+	x = np.sort(dagum_sample(points))
+	ax.plot(x, np.arange(1, points + 1) / points, marker='.', linestyle='none', markersize=5)
+	ax.set_xscale('symlog')
+	directory = tempfile.mkdtemp(prefix='figure_benchmark_')
+	atexit.register(shutil.rmtree, directory, True)
+	return {'exporter': FigureExporter(directory), 'fig': fig, 'dpi': dpi}
+
+@benchmark(params={'points': [10**3, 10**5], 'dpi': [100, 300]}, setup=figure_setup, repeat=3)
+def figure_export(exporter, fig, dpi):
+	exporter.save(fig, 'benchmark.png', dpi=dpi, numbered=False)
+	exporter.flush()
+#endregion
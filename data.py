@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 import re
+import json
+import os
 
 import copy
 
@@ -53,6 +55,12 @@ class FedData():
 		# Renormalize units to single dollars
 		self.df_net_worth *= 1_000_000 
 
+		# US population and households of every quarter
+		self.df_population = load_population(self.df_net_worth.index)
+
+		# Net worth per person and per household of every quarter and category, one division of the whole cube
+		self.df_per_capita = {unit: self.df_net_worth / self.get_people_in_category_data(unit) for unit in self.df_population.columns}
+
 		self.loaded = True
 		print("FED net worth data loaded")
 	
@@ -61,6 +69,67 @@ class FedData():
 			raise Exception("Data not loaded. Call the 'load' method first.") 
 		return self.df_net_worth.copy()
 
+	def get_population_data(self):
+		if not self.loaded:
+			raise Exception("Data not loaded. Call the 'load' method first.")
+		return self.df_population.copy()
+
+	def get_people_in_category_data(self, unit='Population'):
+		"""
+		Number of people, or households, in every category of every quarter.
+
+		:param unit: 'Population' or 'Households'.
+		:return: DataFrame indexed by quarter with one column per category.
+		"""
+		shares = pd.Series(self.POPULATION_SIZES)[self.df_net_worth.columns]
+		counts = np.outer(self.df_population[unit].to_numpy(), shares.to_numpy())
+		return pd.DataFrame(counts, index=self.df_net_worth.index, columns=self.df_net_worth.columns)
+
+	def get_per_capita_net_worth_data(self, unit='Population'):
+		"""
+		Net worth per person, or per household, of every category and quarter.
+
+		:param unit: 'Population' or 'Households'.
+		:return: DataFrame shaped like `get_net_worth_data`.
+		"""
+		if not self.loaded:
+			raise Exception("Data not loaded. Call the 'load' method first.")
+		return self.df_per_capita[unit].copy()
+
+
+# https://www.census.gov/programs-surveys/popest/data/tables.html, see data/CENSUS/source.txt
+def load_population(quarters, path="data/CENSUS/us-population-households.csv"):
+	"""
+	Annual US population and household counts interpolated to quarters.
+
+	Population estimates are as of July 1 and household counts as of March. Both are interpolated
+	log-linearly, i.e. at a constant growth rate between observations, to the middle of every quarter,
+	and extrapolated with the growth rate of the nearest pair of years outside the table.
+
+	:param quarters: PeriodIndex of quarters.
+	:return: DataFrame indexed by the quarters with 'Population' and 'Households' columns.
+	"""
+	annual_df = pd.read_csv(path)
+	quarter_times = quarters.year + (quarters.quarter - 1) / 4 + 1 / 8
+
+	# Fraction of the year at which each series is observed
+	observed_at = {'Population': 0.5, 'Households': 2 / 12}
+
+	columns = {}
+	for column, offset in observed_at.items():
+		times = annual_df['Year'].to_numpy() + offset
+		log_values = np.log(annual_df[column].to_numpy(dtype=float))
+		interpolated = np.interp(quarter_times, times, log_values)
+
+		# Extend the growth of the first and last pair of years
+		first_slope = (log_values[1] - log_values[0]) / (times[1] - times[0])
+		last_slope = (log_values[-1] - log_values[-2]) / (times[-1] - times[-2])
+		interpolated = np.where(quarter_times < times[0], log_values[0] + (quarter_times - times[0]) * first_slope, interpolated)
+		interpolated = np.where(quarter_times > times[-1], log_values[-1] + (quarter_times - times[-1]) * last_slope, interpolated)
+		columns[column] = np.exp(interpolated)
+
+	return pd.DataFrame(columns, index=quarters)
+
 
 class PSIDData():
 	def __init__(self):
@@ -171,6 +240,63 @@ class PSIDData():
 		return None
 
 
+class SyntheticPSIDData(PSIDData):
+	'''
+	Household wealth panel written by `utils.synthetic.generate_population`, in the layout of PSIDData.
+
+	The columns are memory-mapped read-only from their .npy files, so loading is instant at any size and
+	`get_household_wealth_data` returns views instead of copies. Only the inflation and equivalence scale
+	adjustments materialize the wealth column in memory.
+	'''
+	def __init__(self, directory):
+		super().__init__()
+		self.directory = directory
+
+	def load(self, cpi_adjust: bool, equivalence_scale_adjust: bool, target_year=2022):
+		print("Loading synthetic household wealth data...")
+
+		with open(os.path.join(self.directory, 'population.json')) as file:
+			self.description = json.load(file)
+
+		if cpi_adjust:
+			oecd_data = OECDData()
+			oecd_data.load()
+			cpi_data = oecd_data.get_cpi_data()
+			cpi_target_year = cpi_data[cpi_data['TIME'] == target_year]['Value'].iloc[0]
+			self.cpi_multiplier_dict = {
+				str(year): cpi_target_year / cpi_value
+				for year, cpi_value in zip(cpi_data['TIME'], cpi_data['Value'])
+			}
+
+		self.household_wealth_year_dfs = {}
+		for year in self.description['years']:
+			columns = {
+				column: np.load(os.path.join(self.directory, year, file_name), mmap_mode='r')
+				for column, file_name in self.description['columns'].items()
+			}
+			family_ids = columns.pop('FAMILY ID')
+
+			wealth = columns['IMP WEALTH W/ EQUITY']
+			if cpi_adjust:
+				wealth = wealth * self.cpi_multiplier_dict[year]
+			# Net household wealth is divided by the square root of the number of household members
+			if equivalence_scale_adjust:
+				wealth = wealth / np.sqrt(columns['# IN FU'])
+			columns['IMP WEALTH W/ EQUITY'] = wealth
+
+			year_df = pd.DataFrame(columns, index=pd.Index(family_ids, name='FAMILY ID'), copy=False)
+			self.household_wealth_year_dfs[year] = year_df
+
+		self.loaded = True
+		print("Synthetic household wealth data loaded")
+
+	def get_household_wealth_data(self):
+		if not self.loaded:
+			raise Exception("Data not loaded. Call the 'load' method first.")
+		# The frames are read-only views of the files, no need for a deep copy
+		return dict(self.household_wealth_year_dfs)
+
+
 class OECDData():
 	def __init__(self):
 		self.loaded = False
@@ -0,0 +1,198 @@
+"""
+Command-line entry point of the analyses.
+
+	python -m modeling_wealth list pt3
+	python -m modeling_wealth run pt3 --years 2015,2017,2019 --jobs 8 --sections pareto_scan
+	python -m modeling_wealth generate out/synthetic --households 10000000
+	python -m modeling_wealth run pt3 --synthetic out/synthetic --sections pareto_scan
+	python -m modeling_wealth profile pt3_modeling_wealth_pareto.py --folded out/profile/pt3.folded
+
+The sections that do not depend on the year, e.g. loading the PSID and FED data, run once and their
+outputs are shared by one runner per year. The years then run concurrently and the time spent in
+every section of every year is reported.
+
+`profile` runs a plain `# %%` script cell by cell under `utils.profiling.Profiler`.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from constants import PSID_CHOSEN_PERIOD
+from data import SyntheticPSIDData
+from utils.profiling import Profiler, compare_reports, format_report, run_script
+from utils.synthetic import generate_population
+
+# Analysis name to the module defining its `sections` graph and `make_runner`
+ANALYSES = {
+	'pt3': 'pt3_sections',
+}
+
+# Parameters of `make_runner` that differ between the runners of one invocation
+VARYING_PARAMETERS = ('year', 'fed_period')
+
+def load_analysis(name):
+	return importlib.import_module(ANALYSES[name])
+
+def fed_period_of(year):
+	# First quarter of the PSID year, as FED_CHOSEN_PERIOD is paired with PSID_CHOSEN_PERIOD
+	return f'{year}Q1'
+
+def run(analysis, years, targets=None, jobs=1, equivalence_scale_adjust=False, **shared):
+	"""
+	Runs sections of an analysis for several PSID years.
+
+	Parameters
+	----------
+	analysis : str
+		Key of `ANALYSES`.
+	years : list of str
+		PSID years, each paired with the first FED quarter of the year.
+	targets : list of str, optional
+		Sections or outputs to compute. Defaults to every section that plots.
+	jobs : int
+		Number of sections run at the same time, split between the years.
+	equivalence_scale_adjust : bool
+		Adjust net worth to individuals rather than households.
+	**shared
+		Outputs given to every runner instead of being computed, e.g. a loaded `psid_data`.
+
+	Returns
+	-------
+	runners : dict
+		Year to its runner, holding the computed values and the timings.
+	shared_runner : SectionRunner
+		Runner of the sections shared by all years.
+	"""
+	module = load_analysis(analysis)
+	graph = module.sections
+	if not targets:
+		targets = [name for name, section in graph.sections.items() if section.plots]
+
+	# Sections shared by all years, run once
+	shared_runner = module.make_runner(year=years[0], fed_period=fed_period_of(years[0]), equivalence_scale_adjust=equivalence_scale_adjust, **shared)
+	shared_sections = graph.independent(targets, shared_runner.values, VARYING_PARAMETERS)
+	shared_runner.run([section.name for section in shared_sections], jobs=jobs)
+	shared.update({output: shared_runner.values[output] for section in shared_sections for output in section.outputs})
+
+	runners = {
+		year: module.make_runner(year=year, fed_period=fed_period_of(year), equivalence_scale_adjust=equivalence_scale_adjust, **shared)
+		for year in years
+	}
+
+	# Years run side by side, each with its share of the jobs
+	year_jobs = max(1, jobs // len(years))
+	with ThreadPoolExecutor(max_workers=min(jobs, len(years))) as executor:
+		futures = [executor.submit(runner.run, targets, year_jobs) for runner in runners.values()]
+		for future in futures:
+			future.result()
+
+	for runner in runners.values():
+		if 'exporter' in runner.values:
+			runner.values['exporter'].flush()
+	return runners, shared_runner
+
+def print_timings(runners, shared_runner):
+	"""
+	Prints the time spent in every section, shared sections once.
+	"""
+	for name, seconds in shared_runner.timings.items():
+		print(f'{"shared":<8}{name:<28}{seconds:>9.2f}s')
+	for year, runner in runners.items():
+		for name, seconds in runner.timings.items():
+			print(f'{year:<8}{name:<28}{seconds:>9.2f}s')
+
+def profile(script, report_path=None, folded_path=None, baseline_path=None, trace_memory=True):
+	"""
+	Runs a `# %%` script under a `utils.profiling.Profiler`, writes its report and prints a summary.
+	"""
+	if report_path is None:
+		report_path = os.path.join('out', 'profile', os.path.splitext(os.path.basename(script))[0] + '.json')
+	# Read before the run overwrites it
+	baseline = None
+	if baseline_path is not None:
+		with open(baseline_path) as file:
+			baseline = json.load(file)
+
+	profiler = Profiler(trace_memory=trace_memory)
+	with profiler.patched():
+		run_script(script, profiler)
+	profiler.write(report_path, folded_path)
+
+	report = profiler.report()
+	print('\n'.join(format_report(report)))
+	if baseline is not None:
+		print(f'\nCompared with {baseline_path}:')
+		print('\n'.join(compare_reports(report, baseline)))
+	print(f'\nReport written to {report_path}')
+	return 0
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='modeling_wealth', description='Runs the wealth analyses.')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	list_parser = commands.add_parser('list', help='List the sections of an analysis.')
+	list_parser.add_argument('analysis', choices=sorted(ANALYSES))
+
+	run_parser = commands.add_parser('run', help='Run sections of an analysis for several years.')
+	run_parser.add_argument('analysis', choices=sorted(ANALYSES))
+	run_parser.add_argument('--years', default=PSID_CHOSEN_PERIOD, help='Comma separated PSID years (default: %(default)s).')
+	run_parser.add_argument('--sections', default='', help='Comma separated sections or outputs (default: every plot).')
+	run_parser.add_argument('--jobs', type=int, default=1, help='Sections run at the same time (default: %(default)s).')
+	run_parser.add_argument('--individual', action='store_true', help='Equivalence scale adjust net worth to individuals.')
+	run_parser.add_argument('--synthetic', metavar='DIRECTORY', help='Use a population of utils.synthetic instead of the PSID data.')
+
+	generate_parser = commands.add_parser('generate', help='Generate a synthetic population for load testing.')
+	generate_parser.add_argument('directory')
+	generate_parser.add_argument('--households', type=int, default=1_000_000, help='Households in every wave (default: %(default)s).')
+	generate_parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: one per CPU).')
+	generate_parser.add_argument('--seed', type=int, default=None)
+
+	profile_parser = commands.add_parser('profile', help='Run a # %% script cell by cell and report where the time went.')
+	profile_parser.add_argument('script')
+	profile_parser.add_argument('--report', help='JSON report to write (default: out/profile/<script>.json).')
+	profile_parser.add_argument('--folded', help='Also write folded stacks for flamegraph.pl or speedscope.')
+	profile_parser.add_argument('--compare', metavar='REPORT', help='Earlier report to compare the sections with.')
+	profile_parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc, which slows allocations down.')
+
+	args = parser.parse_args(argv)
+	if args.command == 'profile':
+		return profile(args.script, args.report, args.folded, args.compare, not args.no_memory)
+	if args.command == 'generate':
+		start = time.perf_counter()
+		description = generate_population(args.directory, args.households, n_jobs=args.jobs, seed=args.seed)
+		print(f'{description["households"] * len(description["years"]):,} household-waves written to {args.directory} in {time.perf_counter() - start:.2f}s')
+		return 0
+
+	module = load_analysis(args.analysis)
+	graph = module.sections
+
+	if args.command == 'list':
+		for name, section in graph.sections.items():
+			outputs = ', '.join(section.outputs) or ('plot' if section.plots else '-')
+			print(f'{name:<28}{", ".join(section.inputs):<72} -> {outputs}')
+		return 0
+
+	years = [year.strip() for year in args.years.split(',') if year.strip()]
+	targets = [target.strip() for target in args.sections.split(',') if target.strip()]
+	unknown = [target for target in targets if target not in graph.sections and target not in graph.producers]
+	if unknown:
+		parser.error(f"unknown sections {', '.join(unknown)}; see `list {args.analysis}`")
+	if args.jobs < 1:
+		parser.error('--jobs must be at least 1')
+
+	start = time.perf_counter()
+	shared = {}
+	if args.synthetic:
+		shared['psid_data'] = SyntheticPSIDData(args.synthetic)
+		shared['psid_data'].load(cpi_adjust=False, equivalence_scale_adjust=args.individual)
+	runners, shared_runner = run(args.analysis, years, targets, args.jobs, args.individual, **shared)
+	print_timings(runners, shared_runner)
+	print(f'{"total":<36}{time.perf_counter() - start:>9.2f}s')
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -4,13 +4,14 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import matplotlib.ticker as ticker
-import matplotlib.animation as animation
 import seaborn as sns
 import os
-import shutil
 from io import StringIO
 from data import FedData, PSIDData
 from utils.helper import calculate_percentiles
+from utils.render import render_segmented
+from utils.cache import DiskCache
+from utils.figure_export import FigureExporter
 import math
 
 # %%
@@ -20,17 +21,12 @@ import math
 #region
 OUTPUT_DIRECTORY = 'out/pt1'
 
-if os.path.exists(OUTPUT_DIRECTORY):
-	shutil.rmtree(OUTPUT_DIRECTORY)
- 
-os.makedirs(OUTPUT_DIRECTORY)
-
-plt_cnt = 0
+# PNGs are encoded in the background, numbered in save order. Cells guarded by
+# exporter.restore reuse their previous figure while their code and data are unchanged.
+exporter = FigureExporter(OUTPUT_DIRECTORY, cache=DiskCache('cache/figures', max_bytes=1024**3))
 
 def save_fig(plt, name):
-	global plt_cnt
-	plt.savefig(f'{OUTPUT_DIRECTORY}/{plt_cnt}_{name}')
-	plt_cnt += 1
+	exporter.save(plt.gcf(), name)
 
 #endregion
 
@@ -167,15 +163,11 @@ save_fig(plt, 'net_worth_dist_bar.png')
 # Calculate normalized (Per capita) wealth
 #================================================================
 #region
-# Define the total population
-TOTAL_POPULATION = 333_287_557
-
-# Calculate the number of people in each category
-people_in_category = {category: TOTAL_POPULATION * size for 
-					  category, size in fed_data.POPULATION_SIZES.items()}
+# Wealth per person in each category of every quarter, with the population of the quarter
+per_capita_net_worth_df = fed_data.get_per_capita_net_worth_data()
 
-# Normalize the wealth by number of people in each category
-normalized_wealth = net_worth_chosen_period_df / pd.Series(people_in_category)
+# Normalized wealth of the chosen period
+normalized_wealth = per_capita_net_worth_df.loc[chosen_period]
 #endregion
 
 # %%
@@ -404,8 +396,6 @@ save_fig(plt, 'scaled_log_net_worth_per_capita_bar.png')
 #================================================================
 #region
 
-people_in_category = {category: TOTAL_POPULATION * size for category, size in fed_data.POPULATION_SIZES.items()}
-
 def update(frame, ax1, ax2, ax3, ax4):
 	ax1.clear()
 	ax2.clear() 
@@ -416,8 +406,8 @@ def update(frame, ax1, ax2, ax3, ax4):
 	chosen_period = f'{year}{quarter}'
 	net_worth_chosen_period_df = net_worth_df.loc[chosen_period]
 
-	# Calculate the normalized (Per capita) wealth
-	normalized_wealth = net_worth_chosen_period_df / pd.Series(people_in_category)
+	# Normalized (Per capita) wealth of the quarter
+	normalized_wealth = per_capita_net_worth_df.loc[chosen_period]
 
 	#---------------------------------
 	# Net Worth Plot
@@ -554,8 +544,6 @@ def update(frame, ax1, ax2, ax3, ax4):
 	notate_plot(plt, margin=0.20)
 
 
-fig = plt.figure(figsize=(14, 8))
-
 # Create a list of all year-quarter combinations
 years = range(1989, 2024)
 quarters = ['Q1', 'Q2', 'Q3', 'Q4']
@@ -563,12 +551,17 @@ frames = [(year, quarter) for year in years for quarter in quarters
 		  if not (year == 1989 and quarter in ['Q1', 'Q2']) 
 		  and not (year == 2023 and quarter in ['Q3', 'Q4'])]
 
-# Set up subplots
-fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(14, 8))
-
-print('Rendering animation...')
-anim = animation.FuncAnimation(fig, update, fargs=(ax1, ax2, ax3, ax4), frames=frames, interval=100)
-anim.save('out/pt1/net_worth_animation.mp4', writer='ffmpeg')
-print('Animation finished rendering.')
+# Set up subplots, one figure per rendering process
+def make_animation_figure():
+	fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(14, 8))
+	return fig, (ax1, ax2, ax3, ax4)
+
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_animation.mp4', net_worth_df, per_capita_net_worth_df, numbered=False):
+	print('Rendering animation...')
+	# Segments of the frames are rendered in parallel and concatenated
+	render_segmented(make_animation_figure, update, frames, 'out/pt1/net_worth_animation.mp4', fps=10)
+	exporter.store('net_worth_animation.mp4')
+	print('Animation finished rendering.')
 #endregion
 # %%
@@ -6,9 +6,11 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import seaborn as sns
 import os
-import shutil
 from data import FedData, PSIDData
 from utils.helper import calculate_percentiles
+from utils.decimate import plot_decimated
+from utils.cache import DiskCache
+from utils.figure_export import FigureExporter
 from constants import PSID_CHOSEN_PERIOD
 
 # %%
@@ -18,17 +20,12 @@ from constants import PSID_CHOSEN_PERIOD
 #region
 OUTPUT_DIRECTORY = 'out/pt2'
 
-if os.path.exists(OUTPUT_DIRECTORY):
-	shutil.rmtree(OUTPUT_DIRECTORY)
- 
-os.makedirs(OUTPUT_DIRECTORY)
-
-plt_cnt = 0
+# PNGs are encoded in the background, numbered in save order. Cells guarded by
+# exporter.restore reuse their previous figure while their code and data are unchanged.
+exporter = FigureExporter(OUTPUT_DIRECTORY, cache=DiskCache('cache/figures', max_bytes=1024**3))
 
 def save_fig(plt, name):
-	global plt_cnt
-	plt.savefig(f'{OUTPUT_DIRECTORY}/{plt_cnt}_{name}')
-	plt_cnt += 1
+	exporter.save(plt.gcf(), name)
 #endregion
 # %%
 #================================================================
@@ -90,7 +87,7 @@ psid_wealth_chosen_period_df = psid_wealth_dict[PSID_CHOSEN_PERIOD]
 #================================================================
 #region
 wealth_percentiles = calculate_percentiles(psid_wealth_chosen_period_df, 'IMP WEALTH W/ EQUITY', 0.01)
-percentiles_df = pd.DataFrame(list(wealth_percentiles.items()), columns=['Percentile', 'Wealth'])
+percentiles_df = wealth_percentiles.reset_index().rename(columns={'IMP WEALTH W/ EQUITY': 'Wealth'})
 #endregion
 # %%
 #================================================================
@@ -241,7 +238,7 @@ cdf_values = np.arange(1, len(sorted_data)+1) / len(sorted_data)
 plt.figure(figsize=(14, 8))
 
 # Plot
-plt.plot(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+plot_decimated(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
 
 # Title and labels
 plt.title(f'{PSID_CHOSEN_PERIOD} - Empirical CDF of {"Household" if HOUSEHOLD else "Individual"} Net Worth')
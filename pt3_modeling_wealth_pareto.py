@@ -6,15 +6,23 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import matplotlib.lines as mlines
 import matplotlib.animation as animation
-from scipy.stats import pareto
-from scipy.stats import linregress
+from scipy.stats import lognorm, pareto
 # from sklearn.neighbors import KernelDensity
 from scipy.optimize import curve_fit
 import seaborn as sns
 import os
-import shutil
 from data import FedData, PSIDData
-from utils.helper import calculate_percentiles, ssd
+from utils.cache import DiskCache
+from utils.dagum_generalized import DagumGeneralNetWealth
+from utils.decimate import plot_decimated, quantile_thin_indices
+from utils.helper import calculate_percentiles, linregress_scan, ssd
+from utils.goodness_of_fit import goodness_of_fit
+from utils.pareto_interpolation import ParetoInterpolation
+from utils.pareto_tail import pareto_tail_p_value, pareto_tail_scan, select_x_min
+from utils.qq import FrozenDagum, quantile_quantile
+from utils.render import render_blitted
+from utils.wealth_sample import WealthSample
+from utils.figure_export import FigureExporter
 from constants import PSID_CHOSEN_PERIOD
 
 #%%
@@ -23,17 +31,12 @@ from constants import PSID_CHOSEN_PERIOD
 #region
 OUTPUT_DIRECTORY = 'out/pt3'
 
-if os.path.exists(OUTPUT_DIRECTORY):
-	shutil.rmtree(OUTPUT_DIRECTORY)
- 
-os.makedirs(OUTPUT_DIRECTORY)
-
-plt_cnt = 0
+# PNGs are encoded in the background, numbered in save order. Cells guarded by
+# exporter.restore reuse their previous figure while their code and data are unchanged.
+exporter = FigureExporter(OUTPUT_DIRECTORY, cache=DiskCache('cache/figures', max_bytes=1024**3))
 
 def save_fig(plt, name):
-	global plt_cnt
-	plt.savefig(f'{OUTPUT_DIRECTORY}/{plt_cnt}_{name}')
-	plt_cnt += 1
+	exporter.save(plt.gcf(), name)
 #endregion
 
 #%%
@@ -77,6 +80,8 @@ psid_data = PSIDData()
 equivalence_scale_adjust = False
 psid_data.load(cpi_adjust=False, equivalence_scale_adjust=equivalence_scale_adjust, target_year=2019)
 psid_wealth_dict = psid_data.get_household_wealth_data()
+# Sorted wealth of every year, shared by the sections below
+wealth_samples = WealthSample.from_psid(psid_data)
 
 
 HOUSEHOLD = not equivalence_scale_adjust
@@ -88,6 +93,7 @@ HOUSEHOLD = not equivalence_scale_adjust
 #region
 psid_chosen_period_df = psid_wealth_dict[PSID_CHOSEN_PERIOD]
 psid_wealth_chosen_period_df = psid_chosen_period_df['IMP WEALTH W/ EQUITY']
+wealth_sample = wealth_samples[PSID_CHOSEN_PERIOD]
 #endregion
 
 # %%
@@ -95,7 +101,7 @@ psid_wealth_chosen_period_df = psid_chosen_period_df['IMP WEALTH W/ EQUITY']
 #================================================================
 #region
 wealth_percentiles = calculate_percentiles(psid_chosen_period_df, 'IMP WEALTH W/ EQUITY', 0.01)
-percentiles_df = pd.DataFrame(list(wealth_percentiles.items()), columns=['Percentile', 'Wealth'])
+percentiles_df = wealth_percentiles.reset_index().rename(columns={'IMP WEALTH W/ EQUITY': 'Wealth'})
 #endregion
 
 # %%
@@ -113,31 +119,33 @@ pareto_cdf_a_1 = pareto.cdf(space, 1, scale=1)
 
 
 
-# Set up figure
-plt.figure(figsize=(14,8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('pareto_cdf.png'):
+	# Set up figure
+	plt.figure(figsize=(14,8))
 
-# Plot
-plt.plot(space, pareto_cdf_a_inf, label=r'$\alpha=\infty$')
-plt.plot(space, pareto_cdf_a_3, label=r'$\alpha=3$')
-plt.plot(space, pareto_cdf_a_2, label=r'$\alpha=2$')
-plt.plot(space, pareto_cdf_a_1_16, label=r'$\alpha=1.16$')
-plt.plot(space, pareto_cdf_a_1, label=r'$\alpha=1$')
+	# Plot
+	plt.plot(space, pareto_cdf_a_inf, label=r'$\alpha=\infty$')
+	plt.plot(space, pareto_cdf_a_3, label=r'$\alpha=3$')
+	plt.plot(space, pareto_cdf_a_2, label=r'$\alpha=2$')
+	plt.plot(space, pareto_cdf_a_1_16, label=r'$\alpha=1.16$')
+	plt.plot(space, pareto_cdf_a_1, label=r'$\alpha=1$')
 
-# Title and labels
-plt.title('Pareto Distribution CDF')
-plt.ylabel(r'Pr$(X \leq x)$')
-plt.xlabel(r'$x$')
+	# Title and labels
+	plt.title('Pareto Distribution CDF')
+	plt.ylabel(r'Pr$(X \leq x)$')
+	plt.xlabel(r'$x$')
 
-# Plot properties
-plt.legend(prop={'size': 12}) 
-plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	# Plot properties
+	plt.legend(prop={'size': 12}) 
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt)
+	# Notate
+	notate_plot(plt)
 
-# Save
-save_fig(plt, 'pareto_cdf.png')
+	# Save
+	save_fig(plt, 'pareto_cdf.png')
 
 #endregion
 
@@ -154,49 +162,51 @@ pareto_pdf_a_2 = pareto.pdf(space, 2, scale=1)
 pareto_pdf_a_1_16 = pareto.pdf(space, 1.16, scale=1)
 pareto_pdf_a_1 = pareto.pdf(space, 1, scale=1)
 
-# Set up figure
-plt.figure(figsize=(14,8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('pareto_pdf.png'):
+	# Set up figure
+	plt.figure(figsize=(14,8))
 
-# Plot
-plt.vlines(1, 0, 3, colors='black', linestyles='solid')
+	# Plot
+	plt.vlines(1, 0, 3, colors='black', linestyles='solid')
 
-# Plot the intersection points as circles
-palette = sns.color_palette()
-colors = iter(palette)
+	# Plot the intersection points as circles
+	palette = sns.color_palette()
+	colors = iter(palette)
 
-# plt.plot(space, pareto_pdf_a_inf, label=r'$\alpha=\infty$')
-plt.plot([], [], label=r'$\lim_{\alpha \to \infty} = \delta(x - x_m)$', color='none')
-plt.plot(space, pareto_pdf_a_3, label=r'$\alpha=3$')
-plt.plot(space, pareto_pdf_a_2, label=r'$\alpha=2$')
-plt.plot(space, pareto_pdf_a_1_16, label=r'$\alpha=1.16$')
-plt.plot(space, pareto_pdf_a_1, label=r'$\alpha=1$')
+	# plt.plot(space, pareto_pdf_a_inf, label=r'$\alpha=\infty$')
+	plt.plot([], [], label=r'$\lim_{\alpha \to \infty} = \delta(x - x_m)$', color='none')
+	plt.plot(space, pareto_pdf_a_3, label=r'$\alpha=3$')
+	plt.plot(space, pareto_pdf_a_2, label=r'$\alpha=2$')
+	plt.plot(space, pareto_pdf_a_1_16, label=r'$\alpha=1.16$')
+	plt.plot(space, pareto_pdf_a_1, label=r'$\alpha=1$')
 
-# Calculate y-values at x = 1
-y_values = [pareto.pdf(1, a, scale=1) for a in [3, 2, 1.16, 1]]
+	# Calculate y-values at x = 1
+	y_values = [pareto.pdf(1, a, scale=1) for a in [3, 2, 1.16, 1]]
 
-# Reset the color iterator
-palette = sns.color_palette()
-colors = iter(palette)
+	# Reset the color iterator
+	palette = sns.color_palette()
+	colors = iter(palette)
 
-# Plot the intersection points with corresponding colors
-for y in y_values:
-	plt.scatter(1, y, color=next(colors), s=50, zorder=10)
+	# Plot the intersection points with corresponding colors
+	for y in y_values:
+		plt.scatter(1, y, color=next(colors), s=50, zorder=10)
 
-# Title and labels
-plt.title('Pareto Distribution PDF')
-plt.ylabel(r'Pr$(X = x)$')
-plt.xlabel(r'$x$')
+	# Title and labels
+	plt.title('Pareto Distribution PDF')
+	plt.ylabel(r'Pr$(X = x)$')
+	plt.xlabel(r'$x$')
 
-# Plot properties
-plt.legend(prop={'size': 12}) 
-plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	# Plot properties
+	plt.legend(prop={'size': 12}) 
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt)
+	# Notate
+	notate_plot(plt)
 
-# Save
-save_fig(plt, 'pareto_pdf.png')
+	# Save
+	save_fig(plt, 'pareto_pdf.png')
 
 #endregion
 
@@ -232,51 +242,46 @@ the case for the entire range of data, particularly near the lower end.
 # Clamped >0 log-log Net Worth emperical CDF 
 #================================================================
 #region
-arr = psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+inclusion_ratio = wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 print(f'net_worth_log_log_cdf_plot inclusion ratio: {inclusion_ratio}%')
 
-# Filter the values we want
-filtered_arr = arr[(arr > m) & (arr <= n)]
-
-# Sort the data for the empirical CDF
-sorted_data = np.sort(filtered_arr)
-
-# Calculate the empirical CDF values
-cdf_values = np.arange(1, len(sorted_data)+1) / len(sorted_data)
-
-# Set up figure
-plt.figure(figsize=(14, 8))
+# Sorted values we want and their empirical CDF
+sorted_data, cdf_values = wealth_sample.ecdf(m, n)
 
-# Plot
-plt.plot(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_log_log_cdf_plot.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
 
-# Title and labels
-plt.title(f'{PSID_CHOSEN_PERIOD} - {"Household" if HOUSEHOLD else "Individual"} Empirical CDF of Net Worth')
-plt.ylabel(r'Pr$(X \leq x)$')
-plt.xlabel('Net Worth')
+	# Plot
+	plot_decimated(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
 
-# y-axis
-# plt.yscale('log')
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD} - {"Household" if HOUSEHOLD else "Individual"} Empirical CDF of Net Worth')
+	plt.ylabel(r'Pr$(X \leq x)$')
+	plt.xlabel('Net Worth')
 
-# x-axis
-plt.xticks(rotation=45)
-plt.xscale('log')
-def currency_formatter(x, pos):
-	return "${:,.0f}".format(x)
-plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(currency_formatter))
+	# y-axis
+	# plt.yscale('log')
 
-# Plot properties
-plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	# x-axis
+	plt.xticks(rotation=45)
+	plt.xscale('log')
+	def currency_formatter(x, pos):
+		return "${:,.0f}".format(x)
+	plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(currency_formatter))
+
+	# Plot properties
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt, note="data clamped to range [1, 100,000,000]")
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
 
-# Save
-save_fig(plt, 'net_worth_clamped_log_log_cdf_plot.png')
+	# Save
+	save_fig(plt, 'net_worth_clamped_log_log_cdf_plot.png')
 
 #endregion
 
@@ -285,29 +290,17 @@ save_fig(plt, 'net_worth_clamped_log_log_cdf_plot.png')
 #================================================================
 #region
 
-# Function to perform linear regression and return the fit statistics
-def perform_linear_regression(x, y):
-	slope, intercept, r_value, _, _ = linregress(x, y)
-	return slope, intercept, r_value**2
-
 # Function to calculate the weighted R^2
 def weighted_r_squared(r_squared, num_points, total_points):
 	return r_squared * (num_points / total_points)**(1/5)
 
-arr = psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+inclusion_ratio = wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 print(f'{inclusion_ratio}%')
 
-# Filter the values we want
-filtered_arr = arr[(arr > m) & (arr <= n)]
-
-# Sort the data for the empirical CDF
-sorted_data = np.sort(filtered_arr)
-
-# Calculate the empirical CDF values
-cdf_values = np.arange(1, len(sorted_data)+1) / len(sorted_data)
+# Sorted values we want and their empirical CDF
+sorted_data, cdf_values = wealth_sample.ecdf(m, n)
 
 
 # Calculate the log of the minimum and maximum net worth values for the fitting range
@@ -324,97 +317,93 @@ fit_starts = np.exp(log_space)
 plt.figure(figsize=(14, 8))
 
 # Plot the empirical CDF
-plt.plot(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
-
-# Fit lines and goodness of fit measures
-fit_lines = []
-goodness_of_fit = []
-weighted_goodness_of_fit = []
+plot_decimated(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
 
 # Fit space
 fit_space = np.linspace(0.05, 0.95, 19)
 
-# Perform linear regression from different points in log space
-for start_value in fit_starts:
-	# Find the index where the sorted data exceeds the start value
-	start_index = np.searchsorted(sorted_data, start_value)
-	if start_index < len(sorted_data) - 1:  # Ensure we have at least two points to fit
-		# Perform linear regression on log-log scale from this index to the end
-		slope, intercept, r_squared = perform_linear_regression(
-			np.log(sorted_data[start_index:]), 
-			np.log(cdf_values[start_index:])
-		)
-		goodness_of_fit.append(r_squared)
-		fit_lines.append((slope, intercept))
-		num_points_in_fit = len(sorted_data) - start_index
-		weighted_r2 = weighted_r_squared(r_squared, num_points_in_fit, len(sorted_data))
-		weighted_goodness_of_fit.append(weighted_r2)
+# Find the index where the sorted data exceeds each start value
+start_indices = np.searchsorted(sorted_data, fit_starts)
+
+# Ensure we have at least two points to fit
+has_two_points = start_indices < len(sorted_data) - 1
+fit_starts = fit_starts[has_two_points]
+
+# Perform linear regression on log-log scale from each index to the end, from one set of prefix sums
+regressions = linregress_scan(np.log(sorted_data), np.log(cdf_values), start_indices[has_two_points])
+
+# Fit lines and goodness of fit measures
+fit_lines = list(zip(regressions['slope'], regressions['intercept']))
+r_squared_values = list(regressions['r_squared'])
+weighted_r_squared_values = list(weighted_r_squared(regressions['r_squared'], regressions['n'], len(sorted_data)))
 
 # Sort the lines by weighted r^2
 sorted_lines_with_weighted_r2 = sorted(
-	zip(fit_lines, goodness_of_fit, weighted_goodness_of_fit, fit_starts), 
+	zip(fit_lines, r_squared_values, weighted_r_squared_values, fit_starts), 
 	key=lambda x: x[2], 
 	reverse=True
 )
 
 
-# Set up figure
-plt.figure(figsize=(14, 8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_log_log_cdf_lin_fit_plot.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
 
-# Plot
-# Emperical CDF
-plt.plot(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
-
-# Linear fits
-
-# Get the index of the best fit
-best_fit_index = np.argmax(weighted_goodness_of_fit)
-
-# Color scheme for red gradient
-red_colors = plt.cm.Reds(np.linspace(0.3, 1, len(sorted_lines_with_weighted_r2)))
-
-# Plot the fit lines
-for i, ((slope, intercept), r2, weighted_r2, start_value) in enumerate(sorted_lines_with_weighted_r2):
-	# Calculate the range for the linear fit
-	start_index = np.searchsorted(sorted_data, start_value)
-	end_index = len(sorted_data) - 1
-	fit_range = sorted_data[start_index:end_index+1]
-	
-	# Generate the y-values for the fit line within the defined range
-	fit_line = np.exp(intercept + slope * np.log(fit_range))
-	
-	# Determine the color of the line
-	color = 'purple' if i == 0 else red_colors[i]  # First line is the best fit
-	
-	# Plot the line with the appropriate label and alpha based on the weighted goodness of fit
-	plt.plot(fit_range, fit_line, label=f'Fit {i+1} ({fit_range[0]:.0f}, {fit_range[-1]:.0f}) R^2={r2:.3f}',
-			 color=color, alpha=r2)
-
-	
-# Title and labels
-plt.title(f'{PSID_CHOSEN_PERIOD} - Empirical CDF of {"Household" if HOUSEHOLD else "Individual"} Net Worth with Linear Fits')
-plt.ylabel('CDF (Proportion less than x)')
-plt.xlabel('Net Worth')
-
-# y-axis
-plt.yscale('log')
-
-# x-axis
-plt.xticks(rotation=45)
-plt.xscale('log')
-plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
-
-
-# Plot properties
-plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-plt.legend()
-plt.tight_layout()
-
-# Notate
-notate_plot(plt, note="data clamped to range [1, 100,000,000]")
-
-# Save
-save_fig(plt, 'net_worth_clamped_log_log_cdf_lin_fit_plot.png')
+	# Plot
+	# Emperical CDF
+	plot_decimated(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+
+	# Linear fits
+
+	# Get the index of the best fit
+	best_fit_index = np.argmax(weighted_r_squared_values)
+
+	# Color scheme for red gradient
+	red_colors = plt.cm.Reds(np.linspace(0.3, 1, len(sorted_lines_with_weighted_r2)))
+
+	# Plot the fit lines
+	for i, ((slope, intercept), r2, weighted_r2, start_value) in enumerate(sorted_lines_with_weighted_r2):
+		# Calculate the range for the linear fit
+		start_index = np.searchsorted(sorted_data, start_value)
+		end_index = len(sorted_data) - 1
+		fit_range = sorted_data[start_index:end_index+1]
+
+		# Generate the y-values for the fit line within the defined range
+		fit_line = np.exp(intercept + slope * np.log(fit_range))
+
+		# Determine the color of the line
+		color = 'purple' if i == 0 else red_colors[i]  # First line is the best fit
+
+		# Plot the line with the appropriate label and alpha based on the weighted goodness of fit
+		plt.plot(fit_range, fit_line, label=f'Fit {i+1} ({fit_range[0]:.0f}, {fit_range[-1]:.0f}) R^2={r2:.3f}',
+				 color=color, alpha=r2)
+
+
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD} - Empirical CDF of {"Household" if HOUSEHOLD else "Individual"} Net Worth with Linear Fits')
+	plt.ylabel('CDF (Proportion less than x)')
+	plt.xlabel('Net Worth')
+
+	# y-axis
+	plt.yscale('log')
+
+	# x-axis
+	plt.xticks(rotation=45)
+	plt.xscale('log')
+	plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+
+
+	# Plot properties
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.legend()
+	plt.tight_layout()
+
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
+
+	# Save
+	save_fig(plt, 'net_worth_clamped_log_log_cdf_lin_fit_plot.png')
 
 #endregion
 
@@ -426,14 +415,12 @@ save_fig(plt, 'net_worth_clamped_log_log_cdf_lin_fit_plot.png')
 #-------------------------------------
 # Extract Data
 #-------------------------------------
-arr = psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-# inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+# inclusion_ratio = wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 # print(f'{inclusion_ratio}%')
 
-filtered_arr = arr[(arr >= m) & (arr <= n)]
-sorted_data = np.sort(filtered_arr)
+sorted_data = wealth_sample.select(m, n, lower_inclusive=True)
 
 #-------------------------------------
 # Pareto CDF
@@ -451,42 +438,46 @@ pareto_cdf = pareto.cdf(sorted_data, shape, loc=location, scale=scale)
 #-------------------------------------
 
 # Calculate the empirical CDF values
-emperical_cdf_values = np.arange(1, len(sorted_data)+1) / len(sorted_data)
+_, emperical_cdf_values = wealth_sample.ecdf(m, n, lower_inclusive=True)
 
-SSE = ssd(emperical_cdf_values, pareto_cdf)
-print('sse', ssd(emperical_cdf_values, pareto_cdf))
+# Goodness of fit against the empirical CDF
+fit_statistics = goodness_of_fit(sorted_data, pareto_cdf)
+print(fit_statistics)
+SSE = fit_statistics['SSE'][0]
 
-# Set up figure
-plt.figure(figsize=(14, 8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_plot_pareto_cdf.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
 
-# Plot
-plt.plot(sorted_data, emperical_cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+	# Plot
+	plot_decimated(sorted_data, emperical_cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
 
-# Plot
-plt.plot(sorted_data, pareto_cdf, label='Pareto CDF', color='orange')
+	# Plot
+	plt.plot(sorted_data, pareto_cdf, label='Pareto CDF', color='orange')
 
-# Title and labels
-plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto CDF fit,'+ r' $\alpha =$' +f'{shape:,.2f},'+ r', $x_m =$' + f'{scale:,.2f}' + f', SSE = {SSE:,.2f}')
-plt.ylabel(r'Pr$(X \leq x)$')
-plt.xlabel('Net Worth')
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto CDF fit,'+ r' $\alpha =$' +f'{shape:,.2f},'+ r', $x_m =$' + f'{scale:,.2f}' + f', SSE = {SSE:,.2f}')
+	plt.ylabel(r'Pr$(X \leq x)$')
+	plt.xlabel('Net Worth')
 
-# y-axis
-# plt.yscale('log')
+	# y-axis
+	# plt.yscale('log')
 
-# x-axis
-plt.xscale('log')
-plt.xticks(rotation=45)
-plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+	# x-axis
+	plt.xscale('log')
+	plt.xticks(rotation=45)
+	plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
 
-# Plot properties
-plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	# Plot properties
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt, note="data clamped to range [1, 100,000,000]")
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
 
-# Save
-save_fig(plt, 'net_worth_clamped_plot_pareto_cdf.png')
+	# Save
+	save_fig(plt, 'net_worth_clamped_plot_pareto_cdf.png')
 
 #endregion
 
@@ -512,140 +503,228 @@ num_frames = anim_fps * anim_length
 log_m_values = np.linspace(log_n, log_m, num_frames)
 m_values = 10 ** log_m_values  # Convert back to actual values
 
-# Historical SSE Data
-sse_values = []
-
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 8))
-
-
-# m_values = np.arange(n, m + step, step) # 5 seconds @ 60 fps
-# m_values = np.arange(1, 1_000_000, 100_000) # 5 seconds @ 60 fps
-
-def update(frame):
-	print('frame: ', frame)
-	# Clear current axes
-	ax1.clear()
-	ax2.clear()
-
-	#-------------------------------------
-	# Extract Data
-	#-------------------------------------
-	arr = psid_wealth_chosen_period_df 
-	m = m_values[frame]
-	n = 100_000_000
-	# inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
-	# print(f'{inclusion_ratio}%')
-
-	filtered_arr = arr[(arr >= m) & (arr <= n)]
-	sorted_data = np.sort(filtered_arr)
-
-	#-------------------------------------
-	# Pareto CDF
-	#-------------------------------------
-
-	# Estimate parameters for the Pareto distribution
-	shape, location, scale = pareto.fit(sorted_data, floc=0, fscale=m)
-	print(shape, location, scale)
+# Upper clamp of the data
+upper = 100_000_000
 
-	# Generate cdf
-	pareto_cdf = pareto.cdf(sorted_data, shape, loc=0, scale=m)
+# Fit the Pareto tail above every x_m once on a single sorted array
+sorted_wealth = wealth_sample.values
+tail_scan = pareto_tail_scan(sorted_wealth, m_values, upper=upper)
+sse_values = tail_scan['SSE'].to_numpy()
+ranks = np.arange(1, len(wealth_sample)+1)
 
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('pareto_cdf_animation.mp4', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD, numbered=False):
+	fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 8))
 
 	#-------------------------------------
-	# Emperical CDF
+	# Static parts, drawn once
 	#-------------------------------------
 
-	# Calculate the empirical CDF values
-	emperical_cdf_values = np.arange(1, len(sorted_data)+1) / len(sorted_data)
-
-	SSE = ssd(emperical_cdf_values, pareto_cdf)
-	print('sse', ssd(emperical_cdf_values, pareto_cdf))
-
-	# Set up figure
-	# plt.figure(figsize=(14, 8))
-
-	# Plot
-	ax1.plot(sorted_data, emperical_cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
-
-	# Plot
-	ax1.plot(sorted_data, pareto_cdf, label='Pareto CDF', color='orange')
+	# Artists updated every frame
+	empirical_cdf_line, = ax1.plot([], [], marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+	pareto_cdf_line, = ax1.plot([], [], label='Pareto CDF', color='orange')
+	sse_line, = ax2.plot([], [], label='SSE over time')
+	current_sse_point, = ax2.plot([], [], marker='o', linestyle='none', color='red')  # current SSE
 
 	# Title and labels
-	ax1.set_title(f'{PSID_CHOSEN_PERIOD}' + f' - {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto CDF fit,'+ r' $\alpha =$' +f'{shape:,.2f},'+ r', $x_m =$' + f'{scale:,.2f}' + f', SSE = {SSE:,.2f}')
 	ax1.set_ylabel(r'Pr$(X \leq x)$')
 	ax1.set_xlabel('Net Worth')
 
-	# y-axis
-	# ax1.yscale('log')
-
 	# x-axis
 	ax1.set_xscale('log')
-	xticks = ax1.get_xticks()
-	ax1.set_xticks(xticks)
-	ax1.set_xticklabels(xticks, rotation=45)
+	ax1.tick_params(axis='x', labelrotation=45)
 	ax1.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
-	ax1.set_xlim(None,n) 
- 
+	ax1.set_xlim(m_values[0], upper)
 
+	# y-axis
+	ax1.set_ylim(0, 1.05)
 
-	# # Plot properties
+	# Plot properties
 	ax1.grid(True, which='both', linestyle='--', linewidth=0.5)
 
-	# # Update the SSE line graph
-	if SSE is not None:
-		sse_values.append(SSE)
-	print(len(m_values[:frame+1]), len(sse_values))
-	if len(m_values[:frame+1]) == len(sse_values):
-		ax2.plot(m_values[:frame+1], sse_values, label='SSE over time')
-		ax2.scatter(m_values[frame], SSE, color='red')  # current SSE
-
-	# Set titles, labels, etc for both ax1 and ax2
+	# Set titles, labels, etc for ax2
 	ax2.set_title('SSE vs $x_m$')
-	
+
 	ax2.set_xscale('log')
-	xticks = ax2.get_xticks()
-	ax2.set_xticks(xticks)
-	ax2.set_xticklabels(xticks, rotation=45)
+	ax2.tick_params(axis='x', labelrotation=45)
 	ax2.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
-	ax2.set_xlim(1,n) 
- 
- 
+	ax2.set_xlim(1, upper)
+
 	ax2.set_xlabel('$x_m$')
 	ax2.set_ylabel('SSE')
 	ax2.set_yscale('log')
-
+	# The whole SSE trace is known up front, so the limits can be fixed
+	ax2.set_ylim(np.nanmin(sse_values) * 0.8, np.nanmax(sse_values) * 1.25)
+
+	def update(frame):
+		#-------------------------------------
+		# Extract Data
+		#-------------------------------------
+		m = m_values[frame]
+
+		# The tail [m, upper] is a view of the sorted array
+		sorted_data = wealth_sample.select(m, upper, lower_inclusive=True)
+
+		# Parameters of the Pareto distribution from the precomputed scan
+		shape, scale = tail_scan['alpha'][frame], m
+		SSE = sse_values[frame]
+
+		#-------------------------------------
+		# Emperical and Pareto CDF
+		#-------------------------------------
+		# Only the thinned points are drawn
+		plot_indices = quantile_thin_indices(len(sorted_data))
+		plotted_data = sorted_data[plot_indices]
+		emperical_cdf_values = ranks[plot_indices] / len(sorted_data)
+		pareto_cdf = pareto.cdf(plotted_data, shape, loc=0, scale=scale)
+
+		empirical_cdf_line.set_data(plotted_data, emperical_cdf_values)
+		pareto_cdf_line.set_data(plotted_data, pareto_cdf)
+		ax1.set_title(f'{PSID_CHOSEN_PERIOD}' + f' - {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto CDF fit,'+ r' $\alpha =$' +f'{shape:,.2f},'+ r', $x_m =$' + f'{scale:,.2f}' + f', SSE = {SSE:,.2f}')
+
+		#-------------------------------------
+		# SSE trace
+		#-------------------------------------
+		sse_line.set_data(m_values[:frame+1], sse_values[:frame+1])
+		current_sse_point.set_data([m], [SSE])
+
+	# Lay out with the first frame's title in place
+	update(0)
 	plt.tight_layout()
 	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
 
-	# Save
-	# save_fig(plt, 'net_worth_clamped_plot_pareto_cdf.png')
+	print('Rendering animation...')
+	animated_artists = [empirical_cdf_line, pareto_cdf_line, ax1.title, sse_line, current_sse_point]
+	render_blitted(fig, animated_artists, update, range(num_frames), 'out/pt3/pareto_cdf_animation.mp4', fps=anim_fps)
+	exporter.store('pareto_cdf_animation.mp4')
+	print('Animation finished rendering.')
+
+#endregion
+
+# %%
+# Pareto tail x_min by KS minimization, clamped range [1, 1_00_000_000]
+#================================================================
+#region
+
+# Candidate lower bounds of the tail
+upper = 100_000_000
+x_min_candidates = np.logspace(0, np.log10(upper), 400)
+
+# Pick x_min by the smallest KS distance, then test the fit with a semi-parametric bootstrap
+sorted_wealth = wealth_sample.values
+best_tail, x_min_scan = select_x_min(sorted_wealth, x_min_candidates, upper=upper)
+print(f"x_min = {best_tail['threshold']:,.2f}, alpha = {best_tail['alpha']:,.2f}, KS = {best_tail['KS']:.4f}, tail size = {best_tail['n_tail']:,.0f}")
 
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_pareto_x_min_ks.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD):
+	# The bootstrap is only needed for the figure
+	p_value, _ = pareto_tail_p_value(sorted_wealth, best_tail, x_min_candidates, upper=upper, n_replicates=200, seed=0)
+	print(f'p = {p_value:.3f}')
 
-print('Rendering animation...')
-# anim = animation.FuncAnimation(fig, update, frames=len(m_values), interval=1.6666)
-anim = animation.FuncAnimation(fig, update, frames=len(m_values), init_func=lambda: 1+1, interval=(1/anim_fps) * 1000)
-anim.save('out/pt3/pareto_cdf_animation.mp4', writer='ffmpeg')
-print('Animation finished rendering.')
+	# Set up figure
+	plt.figure(figsize=(14, 8))
+
+	# Plot
+	plt.plot(x_min_scan['threshold'], x_min_scan['KS'], label='KS distance')
+	plt.axvline(best_tail['threshold'], color='red', linestyle='--', label=r'Selected $x_m$')
+
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto tail,' + r' $x_m =$' + f'{best_tail["threshold"]:,.2f},' + r' $\alpha =$' + f'{best_tail["alpha"]:,.2f}, p = {p_value:.2f}')
+	plt.ylabel('KS distance')
+	plt.xlabel('$x_m$')
+
+	# x-axis
+	plt.xscale('log')
+	plt.xticks(rotation=45)
+	plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+
+	# Plot properties
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.legend()
+	plt.tight_layout()
+
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
 
-# For displaying in Jupyter Notebook, use:
-# from IPython.display import HTML
-# HTML(anim.to_html5_video())
+	# Save
+	save_fig(plt, 'net_worth_pareto_x_min_ks.png')
 
 #endregion
 
 # %%
-# Net Worth Pareto Q-Q plot, clamped range [1, 1_000_000_000]
+# Net Worth Pareto Q-Q plot, clamped range [1, 1_00_000_000]
 #================================================================
+#region
+m = 1
+n = 100_000_000
+sorted_data = wealth_sample.select(m, n)
+
+# Pareto and lognormal fitted to the clamped data
+shape, location, scale = pareto.fit(sorted_data, floc=0, fscale=m)
+lognormal_sigma, _, lognormal_scale = lognorm.fit(sorted_data, floc=0)
 
+# Dagum fitted to the whole sample in millions, conditioned on the clamp below
+dagum_model = DagumGeneralNetWealth(cache=DiskCache('cache/dagum_fits', suffix='.json'))
+dagum_params = dagum_model.fit(wealth_sample.values / 1_000_000, [0.0562, 0.9, 3.422, 9463.85, 0.677, 9.807, 9.1823], max_seconds=120)
+
+qq_models = {
+	'Pareto': pareto(shape, loc=location, scale=scale),
+	'Lognormal': lognorm(lognormal_sigma, scale=lognormal_scale),
+	'Dagum': FrozenDagum(dagum_params, scale=1_000_000),
+}
+qq_quantiles, qq_deviations, qq_plot_indices = quantile_quantile(sorted_data, qq_models, support=(m, n))
+
+# Median absolute relative deviation of each model over all points
+print((qq_deviations.div(qq_quantiles['Empirical'], axis=0)).abs().median())
+
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_qq_plot.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD, dagum_params):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
+
+	# Plot
+	plotted_quantiles = qq_quantiles.iloc[qq_plot_indices]
+	colors = sns.color_palette("viridis", n_colors=len(qq_models))
+	for name, color in zip(qq_models, colors):
+		plt.plot(plotted_quantiles[name], plotted_quantiles['Empirical'], marker='.', linestyle='none', markersize=5, label=name, color=color)
+	plt.plot([m, n], [m, n], color='black', linestyle='--', linewidth=1, label='y = x')
+
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - {"Household" if HOUSEHOLD else "Individual"} Net Worth Q-Q plot,' + r' Pareto $\alpha =$' + f'{shape:,.2f}')
+	plt.ylabel('Empirical quantile')
+	plt.xlabel('Theoretical quantile')
+
+	# y-axis
+	plt.yscale('log')
+	plt.gca().yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+
+	# x-axis
+	plt.xscale('log')
+	plt.xticks(rotation=45)
+	plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+	plt.xlim(m, n)
+	plt.ylim(m, n)
+
+	# Plot properties
+	plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+	plt.legend()
+	plt.tight_layout()
+
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
+
+	# Save
+	save_fig(plt, 'net_worth_clamped_qq_plot.png')
+
+#endregion
 
 # %%
 # Pareto PDF, Net Worth histogram, 200 bins, clamped range [1, 1_000_000_000]
 #================================================================
 #region
-arr = psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+inclusion_ratio = wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 print(f'{inclusion_ratio}%')
 
 # Calculate the total range for the bins
@@ -655,7 +734,7 @@ total_range = n - m
 num_bins = 800
 
 x_grid = np.linspace(0, n, 1000)
-filtered_arr = arr[(arr > m) & (arr <= n)]
+filtered_arr = wealth_sample.select(m, n)
 
 # Filter the data to get the tail (upper 20% by default)
 # tail_data = np.sort(filtered_arr)[int(0.8 * len(filtered_arr)):]
@@ -667,8 +746,8 @@ bin_width = total_range / num_bins
 first_bin_upper_limit = m + bin_width
 print(first_bin_upper_limit)
 
-# Filter the data to get the tail (>= first bin)
-tail_data = np.sort(filtered_arr[filtered_arr >= 1])
+# Filter the data to get the tail (>= first bin), already sorted
+tail_data = wealth_sample.select(max(m, 1), n, lower_inclusive=m < 1)
 
 
 # Estimate parameters for the Pareto distribution using MLE
@@ -677,37 +756,39 @@ print(shape, location, scale)
 # Generate the PDF of the fitted Pareto distribution for plotting
 pareto_pdf_mle = pareto.pdf(x_grid, shape, loc=location, scale=scale)
 
-# Set up figure
-plt.figure(figsize=(14, 8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_hist_pareto_pdf.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
 
-# Plot
-# Looks way better with a log plot
-count, bins, _ = plt.hist(filtered_arr, bins=num_bins, range=(m, n), log=True, histtype='stepfilled',linewidth=0 , alpha=0.8)
-# print(count, bins)
-plt.plot(x_grid, pareto_pdf_mle * len(tail_data) * np.diff(bins)[0], label='Pareto fit (MLE)', color='orange')
+	# Plot
+	# Looks way better with a log plot
+	count, bins, _ = plt.hist(filtered_arr, bins=num_bins, range=(m, n), log=True, histtype='stepfilled',linewidth=0 , alpha=0.8)
+	# print(count, bins)
+	plt.plot(x_grid, pareto_pdf_mle * len(tail_data) * np.diff(bins)[0], label='Pareto fit (MLE)', color='orange')
 
-# Title and labels
-plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - Misleading {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto PDF fit,'+ r' $\alpha =$' +f'{shape:,.2f},'+ f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
-plt.ylabel('Frequency')
-plt.xlabel('Net Worth')
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - Misleading {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto PDF fit,'+ r' $\alpha =$' +f'{shape:,.2f},'+ f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
+	plt.ylabel('Frequency')
+	plt.xlabel('Net Worth')
 
-# y-axis
+	# y-axis
 
-# x-axis
-plt.xticks(rotation=45)
-locs, labels = plt.xticks()  # Get current y-axis tick locations and labels
-plt.xticks(locs, [f"${x*1e-6:.1f}M" for x in locs])  # Set new labels in millions
-plt.xlim(m, n)
+	# x-axis
+	plt.xticks(rotation=45)
+	locs, labels = plt.xticks()  # Get current y-axis tick locations and labels
+	plt.xticks(locs, [f"${x*1e-6:.1f}M" for x in locs])  # Set new labels in millions
+	plt.xlim(m, n)
 
-# Plot properties
-plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	# Plot properties
+	plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt, note="data clamped to range [1, 100,000,000]")
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
 
-# Save
-save_fig(plt, 'net_worth_clamped_hist_pareto_pdf.png')
+	# Save
+	save_fig(plt, 'net_worth_clamped_hist_pareto_pdf.png')
 
 #endregion
 
@@ -715,10 +796,9 @@ save_fig(plt, 'net_worth_clamped_hist_pareto_pdf.png')
 # Pareto PPF, clamped range [1, 1_00_000_000]
 #================================================================
 #region
-arr = psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+inclusion_ratio = wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 print(f'{inclusion_ratio}%')
 
 # Calculate the total range for the bins
@@ -728,7 +808,7 @@ total_range = n - m
 num_bins = 800
 
 x_grid = np.linspace(0, n, 1000)
-filtered_arr = arr[(arr > m) & (arr <= n)]
+filtered_arr = wealth_sample.select(m, n)
 
 # Filter the data to get the tail (upper 20% by default)
 # tail_data = np.sort(filtered_arr)[int(0.8 * len(filtered_arr)):]
@@ -740,8 +820,8 @@ bin_width = total_range / num_bins
 first_bin_upper_limit = m + bin_width
 print(first_bin_upper_limit)
 
-# Filter the data to get the tail (>= first bin)
-tail_data = np.sort(filtered_arr[filtered_arr >= 1])
+# Filter the data to get the tail (>= first bin), already sorted
+tail_data = wealth_sample.select(max(m, 1), n, lower_inclusive=m < 1)
 
 
 # Estimate parameters for the Pareto distribution using MLE
@@ -751,34 +831,36 @@ print(shape, location, scale)
 percentiles = np.linspace(0.0, 1.0, 1000)
 pareto_ppf = pareto.ppf(percentiles, shape, loc=location, scale=scale)
 
-# Set up figure
-plt.figure(figsize=(14, 8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_plot_pareto_ppf.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
 
-# Plot
-plt.plot(percentiles*100, pareto_ppf, color='orange')
+	# Plot
+	plt.plot(percentiles*100, pareto_ppf, color='orange')
 
-# Title and labels
-plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - Misleading {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto Percentiles,'+ r' $\alpha =$' +f'{shape:,.2f},'+ f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
-plt.ylabel('Net Worth')
-plt.xlabel('Percentile')
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - Misleading {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto Percentiles,'+ r' $\alpha =$' +f'{shape:,.2f},'+ f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
+	plt.ylabel('Net Worth')
+	plt.xlabel('Percentile')
 
-# y-axis
-plt.yscale('log')
-plt.gca().yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+	# y-axis
+	plt.yscale('log')
+	plt.gca().yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
 
-# x-axis
-# plt.xticks(rotation=45)
-plt.xticks(np.arange(0, 101, 10))
+	# x-axis
+	# plt.xticks(rotation=45)
+	plt.xticks(np.arange(0, 101, 10))
 
-# Plot properties
-plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	# Plot properties
+	plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt, note="data clamped to range [1, 100,000,000]")
+	# Notate
+	notate_plot(plt, note="data clamped to range [1, 100,000,000]")
 
-# Save
-save_fig(plt, 'net_worth_clamped_plot_pareto_ppf.png')
+	# Save
+	save_fig(plt, 'net_worth_clamped_plot_pareto_ppf.png')
 
 #endregion
 
@@ -791,16 +873,13 @@ fed_data.load()
 net_worth_df = fed_data.get_net_worth_data()
 
 chosen_period = '2019Q1'
-net_worth_chosen_period_df = net_worth_df.loc[chosen_period]
-
-# Define the total population
-TOTAL_POPULATION = 333_287_557
 
-# Calculate the number of people in each category
-people_in_category = {category: TOTAL_POPULATION * size for category, size in fed_data.POPULATION_SIZES.items()}
+# Wealth per person in each category, with the population of the chosen period
+normalized_wealth = fed_data.get_per_capita_net_worth_data().loc[chosen_period]
 
-# Normalize the wealth by number of people in each category
-normalized_wealth = net_worth_chosen_period_df / pd.Series(people_in_category)
+# Continuous FED percentile curve of the chosen period, interpolated from the category totals
+fed_percentiles = np.linspace(0.0, 1.0, 1000)
+fed_quantiles = ParetoInterpolation.from_fed(fed_data).quantile(fed_percentiles).loc[chosen_period]
 
 #endregion
 
@@ -808,10 +887,9 @@ normalized_wealth = net_worth_chosen_period_df / pd.Series(people_in_category)
 # Pareto PPF, clamped range (0, 1_000_000_000]
 #================================================================
 #region
-arr = psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+inclusion_ratio = wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 print(f'{inclusion_ratio}%')
 
 # Calculate the total range for the bins
@@ -821,7 +899,7 @@ total_range = n - m
 num_bins = 800
 
 x_grid = np.linspace(0, n, 1000)
-filtered_arr = arr[(arr > m) & (arr <= n)]
+filtered_arr = wealth_sample.select(m, n)
 
 # Filter the data to get the tail (upper 20% by default)
 # tail_data = np.sort(filtered_arr)[int(0.8 * len(filtered_arr)):]
@@ -833,8 +911,8 @@ bin_width = total_range / num_bins
 first_bin_upper_limit = m + bin_width
 print(first_bin_upper_limit)
 
-# Filter the data to get the tail (>= first bin)
-tail_data = np.sort(filtered_arr[filtered_arr >= 1])
+# Filter the data to get the tail (>= first bin), already sorted
+tail_data = wealth_sample.select(max(m, 1), n, lower_inclusive=m < 1)
 
 
 # Estimate parameters for the Pareto distribution using MLE
@@ -844,65 +922,68 @@ print(shape, location, scale)
 percentiles = np.linspace(0.0, 1.0, 1000)
 pareto_ppf = pareto.ppf(percentiles, shape, loc=location, scale=scale)
 
-# Set up figure
-plt.figure(figsize=(14, 8))
+# Skip rendering if the cell and its data are unchanged
+if not exporter.restore('net_worth_clamped_plot_pareto_ppf_fed_comparison.png', wealth_sample.values, PSID_CHOSEN_PERIOD, HOUSEHOLD, normalized_wealth, fed_quantiles):
+	# Set up figure
+	plt.figure(figsize=(14, 8))
 
-print(normalized_wealth)
+	print(normalized_wealth)
 
-# Generate the colors for each set of plots
-# left_colors = sns.color_palette("flare", n_colors=5)
-# mid_colors = sns.color_palette("crest", n_colors=5)
-colors = sns.color_palette("viridis", n_colors=5)
+	# Generate the colors for each set of plots
+	# left_colors = sns.color_palette("flare", n_colors=5)
+	# mid_colors = sns.color_palette("crest", n_colors=5)
+	colors = sns.color_palette("viridis", n_colors=5)
 
-# Now loop through and plot each category with its respective colors
-for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
-	plt.plot(start, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} Left', color=colors[i])
+	# Now loop through and plot each category with its respective colors
+	for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
+		plt.plot(start, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} Left', color=colors[i])
 
-for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
-	plt.plot(start + (end-start)/2, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} Mid', color=colors[i])
- 
-for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
-	plt.plot(end, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} Right', color=colors[i])
+	for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
+		plt.plot(start + (end-start)/2, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} Mid', color=colors[i])
 
-# Plot
-plt.plot(percentiles*100, pareto_ppf, color='orange')
+	for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
+		plt.plot(end, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} Right', color=colors[i])
+
+	# Plot
+	plt.plot(percentiles*100, pareto_ppf, color='orange')
+	plt.plot(fed_percentiles*100, fed_quantiles, color='purple', label='FED, Pareto interpolation')
 
-# Title and labels
-plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - Misleading {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto Percentiles; Fed comparison,'+ r' $\alpha =$' +f'{shape:,.2f},'+ f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
-plt.ylabel('Net Worth')
-plt.xlabel('Percentile')
+	# Title and labels
+	plt.title(f'{PSID_CHOSEN_PERIOD}' + f' - Misleading {"Household" if HOUSEHOLD else "Individual"} Net Worth Pareto Percentiles; Fed comparison,'+ r' $\alpha =$' +f'{shape:,.2f},'+ f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
+	plt.ylabel('Net Worth')
+	plt.xlabel('Percentile')
 
-# y-axis
-plt.yscale('log')
-plt.gca().yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+	# y-axis
+	plt.yscale('log')
+	plt.gca().yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
 
-# x-axis
-# plt.xticks(rotation=45)
-plt.xticks(np.arange(0, 101, 10))
+	# x-axis
+	# plt.xticks(rotation=45)
+	plt.xticks(np.arange(0, 101, 10))
 
-# Plot properties
-handles, labels = plt.gca().get_legend_handles_labels()
+	# Plot properties
+	handles, labels = plt.gca().get_legend_handles_labels()
 
-# Define a custom legend handler by creating a dummy line object
-divider_line = mlines.Line2D([], [], color='black', linestyle='--')
+	# Define a custom legend handler by creating a dummy line object
+	divider_line = mlines.Line2D([], [], color='black', linestyle='--')
 
-# Function to insert a divider
-def insert_divider(index):
-	handles.insert(index, divider_line)
-	labels.insert(index, '')  # An empty string for the label
+	# Function to insert a divider
+	def insert_divider(index):
+		handles.insert(index, divider_line)
+		labels.insert(index, '')  # An empty string for the label
 
-insert_divider(5)  
-insert_divider(11)
+	insert_divider(5)  
+	insert_divider(11)
 
-plt.legend(handles, labels)
+	plt.legend(handles, labels)
 
-plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
-plt.tight_layout()
+	plt.grid(True, axis='y', linestyle='--', linewidth=0.5)
+	plt.tight_layout()
 
-# Notate
-notate_plot(plt, data_source="simba.isr.umich.edu\nfederalreserve.gov", note="data clamped to range [1, 100,000,000]")
+	# Notate
+	notate_plot(plt, data_source="simba.isr.umich.edu\nfederalreserve.gov", note="data clamped to range [1, 100,000,000]")
 
-# Save
-save_fig(plt, 'net_worth_clamped_plot_pareto_ppf_fed_comparison.png')
+	# Save
+	save_fig(plt, 'net_worth_clamped_plot_pareto_ppf_fed_comparison.png')
 
 #endregion
\ No newline at end of file
@@ -0,0 +1,403 @@
+# %%
+# pt3 as a graph of sections
+#
+# The analysis of pt3_modeling_wealth_pareto.py split into sections with explicit inputs and outputs.
+# Running a target runs only the sections it depends on, independent sections run concurrently, and
+# every output is kept by the runner for later targets. Run it with
+#
+#	python -m modeling_wealth run pt3 --years 2015,2017,2019 --jobs 8 --sections pareto_scan
+#
+# or from Python:
+#
+#	runner = make_runner(year='2019')
+#	runner.run(['pareto_scan_plot', 'qq_plot'], jobs=4)
+#	runner.values['best_tail']
+#
+# Figures are written unnumbered to out/pt3/sections/{year}, so their names do not depend on the
+# order the sections finished in.
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
+import matplotlib.lines as mlines
+from scipy.stats import lognorm, pareto
+import seaborn as sns
+from data import FedData, PSIDData
+from utils.cache import DiskCache
+from utils.dagum_generalized import DagumGeneralNetWealth
+from utils.decimate import plot_decimated
+from utils.figure_export import FigureExporter
+from utils.goodness_of_fit import goodness_of_fit
+from utils.pareto_interpolation import ParetoInterpolation
+from utils.pareto_tail import pareto_tail_p_value, pareto_tail_scan, select_x_min
+from utils.qq import FrozenDagum, quantile_quantile
+from utils.sections import SectionGraph
+from utils.wealth_sample import WealthSample
+from constants import FED_CHOSEN_PERIOD, PSID_CHOSEN_PERIOD
+
+OUTPUT_DIRECTORY = 'out/pt3/sections'
+
+# Clamp of the data shared by the sections
+CLAMP_LOWER = 1
+CLAMP_UPPER = 100_000_000
+CLAMP_NOTE = "data clamped to range [1, 100,000,000]"
+
+sections = SectionGraph()
+
+def make_runner(year=PSID_CHOSEN_PERIOD, fed_period=FED_CHOSEN_PERIOD, equivalence_scale_adjust=False, **shared):
+	"""
+	Creates a runner of the pt3 sections for one PSID year.
+
+	Parameters
+	----------
+	year : str
+		PSID period analysed.
+	fed_period : str
+		FED quarter the PSID year is compared with.
+	equivalence_scale_adjust : bool
+		Adjust net worth to individuals rather than households.
+	**shared
+		Outputs already computed elsewhere, e.g. `psid_data` and `fed_data` loaded once for several
+		runners. Their sections are skipped.
+	"""
+	return sections.runner(year=year, fed_period=fed_period, equivalence_scale_adjust=equivalence_scale_adjust, **shared)
+
+#%%
+# Plot helpers
+#================================================================
+#region
+# Set the Seaborn style
+sns.set_style("darkgrid")
+
+# Set global defaults for matplotlib
+plt.rcParams['savefig.dpi'] = 300  # set the DPI for saved figures
+
+def notate_plot(fig, data_source="simba.isr.umich.edu", website="wallen.me/projects/modeling-wealth", note=""):
+	# Adjust the bottom margin to make space for the note
+	fig.subplots_adjust(bottom=0.18)
+
+	extra_note = f"Note: {note}" if note else ""
+
+	# Add the data source and website URL to the plot
+	note_text = f"Data Source: {data_source} \n More info: {website}\n{extra_note}"
+	fig.text(0.95, 0.04, note_text,
+			 ha='right', va='center', transform=fig.transFigure, fontsize=9, alpha=0.7)
+
+def format_dollars(axis):
+	axis.set_major_formatter(ticker.FuncFormatter(lambda x, _: "${:,.0f}".format(x)))
+
+def subject(equivalence_scale_adjust):
+	return "Individual" if equivalence_scale_adjust else "Household"
+#endregion
+
+# %%
+# Importing Data
+#================================================================
+#region
+@sections.section(outputs=('psid_data',))
+def psid_data(equivalence_scale_adjust):
+	psid_data = PSIDData()
+	psid_data.load(cpi_adjust=False, equivalence_scale_adjust=equivalence_scale_adjust, target_year=2019)
+	return psid_data
+
+@sections.section(outputs=('wealth_samples',))
+def wealth_samples(psid_data):
+	return WealthSample.from_psid(psid_data)
+
+@sections.section(outputs=('wealth_sample',))
+def wealth_sample(wealth_samples, year):
+	return wealth_samples[year]
+
+@sections.section(outputs=('fed_data',))
+def fed_data():
+	fed_data = FedData()
+	fed_data.load()
+	return fed_data
+
+@sections.section(outputs=('exporter',))
+def exporter(year, equivalence_scale_adjust):
+	directory = f'{OUTPUT_DIRECTORY}/{year}' + ('_individual' if equivalence_scale_adjust else '')
+	return FigureExporter(directory, cache=DiskCache('cache/figures', max_bytes=1024**3))
+#endregion
+
+# %%
+# Pareto CDF, clamped range [1, 1_00_000_000]
+#================================================================
+#region
+@sections.section(outputs=('pareto_shape', 'pareto_fit_statistics'))
+def pareto_fit(wealth_sample):
+	sorted_data = wealth_sample.select(CLAMP_LOWER, CLAMP_UPPER, lower_inclusive=True)
+
+	# Estimate the shape of a Pareto distribution starting at the clamp
+	shape, location, scale = pareto.fit(sorted_data, floc=0, fscale=CLAMP_LOWER)
+	fit_statistics = goodness_of_fit(sorted_data, pareto.cdf(sorted_data, shape, loc=location, scale=scale))
+	return shape, fit_statistics
+
+@sections.section(plots=True)
+def pareto_cdf_plot(wealth_sample, pareto_shape, pareto_fit_statistics, year, equivalence_scale_adjust, exporter):
+	name = 'net_worth_clamped_plot_pareto_cdf.png'
+	if exporter.restore(name, wealth_sample.values, year, equivalence_scale_adjust, numbered=False):
+		return
+
+	sorted_data, emperical_cdf_values = wealth_sample.ecdf(CLAMP_LOWER, CLAMP_UPPER, lower_inclusive=True)
+	pareto_cdf = pareto.cdf(sorted_data, pareto_shape, scale=CLAMP_LOWER)
+	SSE = pareto_fit_statistics['SSE'][0]
+
+	# Set up figure
+	fig, ax = plt.subplots(figsize=(14, 8))
+
+	# Plot
+	plot_decimated(sorted_data, emperical_cdf_values, ax=ax, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+	ax.plot(sorted_data, pareto_cdf, label='Pareto CDF', color='orange')
+
+	# Title and labels
+	ax.set_title(f'{year} - {subject(equivalence_scale_adjust)} Net Worth Pareto CDF fit,' + r' $\alpha =$' + f'{pareto_shape:,.2f},' + r' $x_m =$' + f'{CLAMP_LOWER:,.2f}' + f', SSE = {SSE:,.2f}')
+	ax.set_ylabel(r'Pr$(X \leq x)$')
+	ax.set_xlabel('Net Worth')
+
+	# x-axis
+	ax.set_xscale('log')
+	ax.tick_params(axis='x', labelrotation=45)
+	format_dollars(ax.xaxis)
+
+	# Plot properties
+	ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+	fig.tight_layout()
+	notate_plot(fig, note=CLAMP_NOTE)
+
+	exporter.save(fig, name, numbered=False)
+	plt.close(fig)
+#endregion
+
+# %%
+# Pareto tail scan & SSE, clamped range [1, 1_00_000_000]
+#================================================================
+#region
+@sections.section(outputs=('tail_scan',))
+def pareto_scan(wealth_sample):
+	# Fit the Pareto tail above x_m values spaced logarithmically up to 5,000,000
+	m_values = np.logspace(0, np.log10(5_000_000), 600)
+	return pareto_tail_scan(wealth_sample.values, m_values, upper=CLAMP_UPPER)
+
+@sections.section(plots=True)
+def pareto_scan_plot(wealth_sample, tail_scan, year, equivalence_scale_adjust, exporter):
+	name = 'net_worth_pareto_scan_sse.png'
+	if exporter.restore(name, wealth_sample.values, year, equivalence_scale_adjust, numbered=False):
+		return
+
+	# Set up figure
+	fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 8))
+
+	# Plot
+	ax1.plot(tail_scan['threshold'], tail_scan['alpha'], label=r'$\alpha$')
+	ax2.plot(tail_scan['threshold'], tail_scan['SSE'], label='SSE')
+
+	# Title and labels
+	fig.suptitle(f'{year} - {subject(equivalence_scale_adjust)} Net Worth Pareto tail fits by ' + r'$x_m$')
+	ax1.set_title(r'$\alpha$ vs $x_m$')
+	ax1.set_ylabel(r'$\alpha$')
+	ax2.set_title('SSE vs $x_m$')
+	ax2.set_ylabel('SSE')
+	ax2.set_yscale('log')
+
+	# x-axis
+	for ax in (ax1, ax2):
+		ax.set_xlabel('$x_m$')
+		ax.set_xscale('log')
+		ax.tick_params(axis='x', labelrotation=45)
+		format_dollars(ax.xaxis)
+		ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+	# Plot properties
+	fig.tight_layout()
+	notate_plot(fig, note=CLAMP_NOTE)
+
+	exporter.save(fig, name, numbered=False)
+	plt.close(fig)
+#endregion
+
+# %%
+# Pareto tail x_min by KS minimization, clamped range [1, 1_00_000_000]
+#================================================================
+#region
+# Candidate lower bounds of the tail
+X_MIN_CANDIDATES = np.logspace(0, np.log10(CLAMP_UPPER), 400)
+
+@sections.section(outputs=('best_tail', 'x_min_scan'))
+def x_min(wealth_sample):
+	return select_x_min(wealth_sample.values, X_MIN_CANDIDATES, upper=CLAMP_UPPER)
+
+@sections.section(outputs=('x_min_p_value',))
+def x_min_p_value(wealth_sample, best_tail):
+	p_value, _ = pareto_tail_p_value(wealth_sample.values, best_tail, X_MIN_CANDIDATES, upper=CLAMP_UPPER, n_replicates=200, seed=0)
+	return p_value
+
+@sections.section(plots=True)
+def x_min_plot(wealth_sample, best_tail, x_min_scan, x_min_p_value, year, equivalence_scale_adjust, exporter):
+	name = 'net_worth_pareto_x_min_ks.png'
+	if exporter.restore(name, wealth_sample.values, year, equivalence_scale_adjust, numbered=False):
+		return
+
+	# Set up figure
+	fig, ax = plt.subplots(figsize=(14, 8))
+
+	# Plot
+	ax.plot(x_min_scan['threshold'], x_min_scan['KS'], label='KS distance')
+	ax.axvline(best_tail['threshold'], color='red', linestyle='--', label=r'Selected $x_m$')
+
+	# Title and labels
+	ax.set_title(f'{year} - {subject(equivalence_scale_adjust)} Net Worth Pareto tail,' + r' $x_m =$' + f'{best_tail["threshold"]:,.2f},' + r' $\alpha =$' + f'{best_tail["alpha"]:,.2f}, p = {x_min_p_value:.2f}')
+	ax.set_ylabel('KS distance')
+	ax.set_xlabel('$x_m$')
+
+	# x-axis
+	ax.set_xscale('log')
+	ax.tick_params(axis='x', labelrotation=45)
+	format_dollars(ax.xaxis)
+
+	# Plot properties
+	ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+	ax.legend()
+	fig.tight_layout()
+	notate_plot(fig, note=CLAMP_NOTE)
+
+	exporter.save(fig, name, numbered=False)
+	plt.close(fig)
+#endregion
+
+# %%
+# Net Worth Q-Q plot, clamped range [1, 1_00_000_000]
+#================================================================
+#region
+@sections.section(outputs=('dagum_params',))
+def dagum_fit(wealth_sample):
+	# Fitted to the whole sample in millions
+	dagum_model = DagumGeneralNetWealth(cache=DiskCache('cache/dagum_fits', suffix='.json'))
+	return dagum_model.fit(wealth_sample.values / 1_000_000, [0.0562, 0.9, 3.422, 9463.85, 0.677, 9.807, 9.1823], max_seconds=120)
+
+@sections.section(plots=True)
+def qq_plot(wealth_sample, pareto_shape, dagum_params, year, equivalence_scale_adjust, exporter):
+	name = 'net_worth_clamped_qq_plot.png'
+	if exporter.restore(name, wealth_sample.values, year, equivalence_scale_adjust, dagum_params, numbered=False):
+		return
+
+	m, n = CLAMP_LOWER, CLAMP_UPPER
+	sorted_data = wealth_sample.select(m, n)
+
+	# Lognormal fitted to the clamped data, the Dagum conditioned on the clamp
+	lognormal_sigma, _, lognormal_scale = lognorm.fit(sorted_data, floc=0)
+	qq_models = {
+		'Pareto': pareto(pareto_shape, scale=m),
+		'Lognormal': lognorm(lognormal_sigma, scale=lognormal_scale),
+		'Dagum': FrozenDagum(dagum_params, scale=1_000_000),
+	}
+	qq_quantiles, _, qq_plot_indices = quantile_quantile(sorted_data, qq_models, support=(m, n))
+
+	# Set up figure
+	fig, ax = plt.subplots(figsize=(14, 8))
+
+	# Plot
+	plotted_quantiles = qq_quantiles.iloc[qq_plot_indices]
+	colors = sns.color_palette("viridis", n_colors=len(qq_models))
+	for model_name, color in zip(qq_models, colors):
+		ax.plot(plotted_quantiles[model_name], plotted_quantiles['Empirical'], marker='.', linestyle='none', markersize=5, label=model_name, color=color)
+	ax.plot([m, n], [m, n], color='black', linestyle='--', linewidth=1, label='y = x')
+
+	# Title and labels
+	ax.set_title(f'{year} - {subject(equivalence_scale_adjust)} Net Worth Q-Q plot,' + r' Pareto $\alpha =$' + f'{pareto_shape:,.2f}')
+	ax.set_ylabel('Empirical quantile')
+	ax.set_xlabel('Theoretical quantile')
+
+	# Axes
+	ax.set_yscale('log')
+	format_dollars(ax.yaxis)
+	ax.set_xscale('log')
+	ax.tick_params(axis='x', labelrotation=45)
+	format_dollars(ax.xaxis)
+	ax.set_xlim(m, n)
+	ax.set_ylim(m, n)
+
+	# Plot properties
+	ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+	ax.legend()
+	fig.tight_layout()
+	notate_plot(fig, note=CLAMP_NOTE)
+
+	exporter.save(fig, name, numbered=False)
+	plt.close(fig)
+#endregion
+
+# %%
+# Comparing with FED percentile data
+#================================================================
+#region
+@sections.section(outputs=('normalized_wealth',))
+def normalized_wealth(fed_data, fed_period):
+	# Wealth per person in each category, with the population of the period
+	return fed_data.get_per_capita_net_worth_data().loc[fed_period]
+
+@sections.section(outputs=('fed_interpolation',))
+def fed_interpolation(fed_data):
+	# Continuous percentile curves of every quarter, interpolated from the category totals
+	return ParetoInterpolation.from_fed(fed_data)
+
+@sections.section(outputs=('fed_dagum_params',))
+def fed_dagum_fit(fed_data, dagum_params):
+	# Dagum parameters of every quarter fitted to the category means, the zero mass and negative shape kept from the PSID fit
+	categories = list(fed_data.POPULATION_SIZES)
+	group_means = fed_data.get_per_capita_net_worth_data()[categories]
+	population_shares = [fed_data.POPULATION_SIZES[category] for category in categories]
+	return DagumGeneralNetWealth().fit_grouped(group_means, population_shares, dagum_params)
+
+@sections.section(plots=True)
+def fed_comparison_plot(wealth_sample, fed_data, normalized_wealth, fed_interpolation, year, fed_period, equivalence_scale_adjust, exporter):
+	name = 'net_worth_clamped_plot_pareto_ppf_fed_comparison.png'
+	if exporter.restore(name, wealth_sample.values, year, equivalence_scale_adjust, normalized_wealth, numbered=False):
+		return
+
+	# Pareto fitted by MLE to the clamped data, already sorted
+	tail_data = wealth_sample.select(CLAMP_LOWER, CLAMP_UPPER)
+	shape, location, scale = pareto.fit(tail_data)
+
+	percentiles = np.linspace(0.0, 1.0, 1000)
+	pareto_ppf = pareto.ppf(percentiles, shape, loc=location, scale=scale)
+
+	# Set up figure
+	fig, ax = plt.subplots(figsize=(14, 8))
+
+	# Left, middle and right of every FED category
+	colors = sns.color_palette("viridis", n_colors=5)
+	for position, place in ((0, 'Left'), (0.5, 'Mid'), (1, 'Right')):
+		for i, (category, (start, end)) in enumerate(fed_data.PERCENTILES.items()):
+			ax.plot(start + (end-start)*position, normalized_wealth[category], marker='o', label=f'{fed_data.PERCENTILES_STR[category]} {place}', color=colors[i])
+
+	# Plot
+	ax.plot(percentiles*100, pareto_ppf, color='orange')
+	ax.plot(percentiles*100, fed_interpolation.quantile(percentiles).loc[fed_period], color='purple', label='FED, Pareto interpolation')
+
+	# Title and labels
+	ax.set_title(f'{year} - Misleading {subject(equivalence_scale_adjust)} Net Worth Pareto Percentiles; Fed comparison,' + r' $\alpha =$' + f'{shape:,.2f},' + f' location = {location:,.2f}' + r', $x_m =$' + f'{scale:,.2f}')
+	ax.set_ylabel('Net Worth')
+	ax.set_xlabel('Percentile')
+
+	# Axes
+	ax.set_yscale('log')
+	format_dollars(ax.yaxis)
+	ax.set_xticks(np.arange(0, 101, 10))
+
+	# Legend with a divider between the left, middle and right points
+	handles, labels = ax.get_legend_handles_labels()
+	divider_line = mlines.Line2D([], [], color='black', linestyle='--')
+	for index in (5, 11):
+		handles.insert(index, divider_line)
+		labels.insert(index, '')
+	ax.legend(handles, labels)
+
+	# Plot properties
+	ax.grid(True, axis='y', linestyle='--', linewidth=0.5)
+	fig.tight_layout()
+	notate_plot(fig, data_source="simba.isr.umich.edu\nfederalreserve.gov", note=CLAMP_NOTE)
+
+	exporter.save(fig, name, numbered=False)
+	plt.close(fig)
+#endregion
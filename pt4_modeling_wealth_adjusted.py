@@ -10,9 +10,12 @@ from scipy.stats import linregress
 from scipy.optimize import curve_fit
 import seaborn as sns
 import os
-import shutil
 from data import FedData, PSIDData
 from utils.helper import calculate_percentiles
+from utils.wealth_sample import WealthSample
+from utils.decimate import plot_decimated
+from utils.cache import DiskCache
+from utils.figure_export import FigureExporter
 from constants import PSID_CHOSEN_PERIOD
 
 #%%
@@ -22,17 +25,12 @@ from constants import PSID_CHOSEN_PERIOD
 #region
 OUTPUT_DIRECTORY = 'out/pt4'
 
-if os.path.exists(OUTPUT_DIRECTORY):
-	shutil.rmtree(OUTPUT_DIRECTORY)
- 
-os.makedirs(OUTPUT_DIRECTORY)
-
-plt_cnt = 0
+# PNGs are encoded in the background, numbered in save order. Cells guarded by
+# exporter.restore reuse their previous figure while their code and data are unchanged.
+exporter = FigureExporter(OUTPUT_DIRECTORY, cache=DiskCache('cache/figures', max_bytes=1024**3))
 
 def save_fig(plt, name):
-	global plt_cnt
-	plt.savefig(f'{OUTPUT_DIRECTORY}/{plt_cnt}_{name}')
-	plt_cnt += 1
+	exporter.save(plt.gcf(), name)
 #endregion
 #%%
 #================================================================
@@ -74,6 +72,8 @@ psid_data = PSIDData()
 equivalence_scale_adjust = False
 psid_data.load(cpi_adjust=False, equivalence_scale_adjust=equivalence_scale_adjust, target_year=2019)
 psid_wealth_dict = psid_data.get_household_wealth_data()
+# Sorted wealth of every year, shared by the sections below
+wealth_samples = WealthSample.from_psid(psid_data)
 
 
 HOUSEHOLD = not equivalence_scale_adjust
@@ -85,6 +85,7 @@ HOUSEHOLD = not equivalence_scale_adjust
 #region
 psid_chosen_period_df: pd.DataFrame = psid_wealth_dict[PSID_CHOSEN_PERIOD]
 psid_wealth_chosen_period_df: pd.Series = psid_chosen_period_df['IMP WEALTH W/ EQUITY']
+wealth_sample = wealth_samples[PSID_CHOSEN_PERIOD]
 #endregion
 #%%
 #================================================================
@@ -92,9 +93,10 @@ psid_wealth_chosen_period_df: pd.Series = psid_chosen_period_df['IMP WEALTH W/ E
 #================================================================
 #region
 
-min_value = np.min(psid_wealth_chosen_period_df)
+min_value = wealth_sample.values[0]
 
 adjusted_psid_wealth_chosen_period_df = psid_wealth_chosen_period_df.apply(lambda x: (x + -min_value + 1) if x < 0 else x)
+adjusted_wealth_sample = WealthSample(adjusted_psid_wealth_chosen_period_df)
 
 
 #endregion
@@ -103,26 +105,19 @@ adjusted_psid_wealth_chosen_period_df = psid_wealth_chosen_period_df.apply(lambd
 # Clamped >0 log-log Net Worth emperical CDF 
 #================================================================
 #region
-arr = adjusted_psid_wealth_chosen_period_df 
 m = 1
 n = 100_000_000
-inclusion_ratio = np.sum((arr > m) & (arr < n)) / len(arr)
+inclusion_ratio = adjusted_wealth_sample.inclusion_ratio(m, n, upper_inclusive=False)
 print(f'net_worth_log_log_cdf_plot inclusion ratio: {inclusion_ratio}%')
 
-# Filter the values we want
-filtered_arr = arr[(arr > m) & (arr <= n)]
-
-# Sort the data for the empirical CDF
-sorted_data = np.sort(filtered_arr)
-
-# Calculate the empirical CDF values
-cdf_values = np.arange(1, len(sorted_data)+1) / len(sorted_data)
+# Sorted values we want and their empirical CDF
+sorted_data, cdf_values = adjusted_wealth_sample.ecdf(m, n)
 
 # Set up figure
 plt.figure(figsize=(14, 8))
 
 # Plot
-plt.plot(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
+plot_decimated(sorted_data, cdf_values, marker='.', linestyle='none', markersize=5, label='Empirical CDF')
 
 # Title and labels
 plt.title(f'{PSID_CHOSEN_PERIOD} - {"Household" if HOUSEHOLD else "Individual"} Empirical CDF of Net Worth')
@@ -3,11 +3,13 @@ from scipy.optimize import minimize
 from data import FedData, PSIDData
 from utils.helper import calculate_percentiles
 from utils.dagum_generalized import DagumGeneralNetWealth
+from utils.cache import DiskCache
 from constants import PSID_CHOSEN_PERIOD
 import matplotlib.pyplot as plt
 
 if __name__=="__main__":
-	dgnw = DagumGeneralNetWealth()
+	# Fits are cached on disk, unchanged inputs return the stored parameters
+	dgnw = DagumGeneralNetWealth(cache=DiskCache('cache/dagum_fits', suffix='.json'))
 	# 1983 figures
 	# in $10,000
 	# -$100,000 to $1,000,000
@@ -51,6 +53,7 @@ if __name__=="__main__":
  
 	fit = dgnw.fit(psid_wealth_chosen_period_df, initial_params)
 	print(fit)
+	print(f"fit time: {dgnw.fit_info['execution_time']:.1f} s, iterations: {dgnw.fit_info['nit']}")
  
 	space = np.linspace(np.min(psid_wealth_chosen_period_df), np.max(psid_chosen_period_df), 1000000)
  
@@ -66,4 +69,14 @@ if __name__=="__main__":
 	plt.plot(space, cdf)
 	plt.yscale('log')
 	plt.xscale('symlog')
+	plt.show()
+
+	# Inequality measures in closed form, no integration over the pdf
+	print(f'mean: {dgnw.mean(*fit):,.4f}, gini: {dgnw.gini(*fit):.4f}')
+
+	population_share = np.linspace(0, 1, 1001)
+	lorenz = dgnw.lorenz(population_share, *fit)
+	plt.figure(figsize=(14, 8))
+	plt.plot(population_share, lorenz)
+	plt.plot(population_share, population_share, linestyle='--', color='black')
 	plt.show()   
\ No newline at end of file
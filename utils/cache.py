@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+def hash_inputs(*objects):
+    """
+    Hash arbitrary analysis inputs into a stable hex digest.
+
+    Arrays are hashed by dtype, shape and raw bytes, pandas objects by their values and labels,
+    containers recursively and everything else by its repr.
+
+    :param objects: The objects to hash.
+    :return: Hex digest of the inputs.
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        _update_hash(digest, obj)
+    return digest.hexdigest()
+
+def _update_hash(digest, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        digest.update(type(obj).__name__.encode())
+        if not isinstance(obj, pd.Index):
+            _update_hash(digest, obj.index)
+        if isinstance(obj, pd.DataFrame):
+            _update_hash(digest, list(obj.columns))
+        _update_hash(digest, obj.to_numpy())
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            _update_hash(digest, obj.tolist())
+        else:
+            digest.update(f'ndarray{obj.dtype.str}{obj.shape}'.encode())
+            digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f'{type(obj).__name__}{len(obj)}'.encode())
+        for item in obj:
+            _update_hash(digest, item)
+    elif isinstance(obj, dict):
+        digest.update(f'dict{len(obj)}'.encode())
+        for key in sorted(obj, key=repr):
+            _update_hash(digest, key)
+            _update_hash(digest, obj[key])
+    elif isinstance(obj, bytes):
+        digest.update(obj)
+    else:
+        digest.update(repr(obj).encode())
+
+
+class DiskCache():
+    """
+    Directory of cache entries keyed by hash with a size cap and least-recently-used eviction.
+
+    Each entry is a single file; reading an entry refreshes its modification time, which is used
+    as the recency when evicting.
+    """
+    def __init__(self, directory, max_bytes=100 * 1024**2, suffix='.bin'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}{self.suffix}')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        # Mark as recently used
+        os.utime(path)
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        # Write atomically so concurrent readers never see a partial entry
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_json(self, key):
+        data = self.get(key)
+        return None if data is None else json.loads(data)
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value).encode())
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        # Remove least recently used entries until under the cap
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                os.remove(entry.path)
@@ -1,5 +1,14 @@
+import os
+import time
 import numpy as np
-from scipy.optimize import minimize
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import Bounds, least_squares, minimize
+from scipy.sparse import block_diag
+from scipy.special import beta as beta_function, betainc, gamma, gammaincc
+from scipy.stats import norm
+from utils.cache import hash_inputs
+from utils.fit_trace import FitTrace
 """
 Dagum  (1990,  1993,  1999,  2004) generalized his income and wealth distribution model specifying a model of net wealth
 distribution with support x \in (-\infty, \infty) to account also for the high observed frequencies of  negative and null net wealth. 
@@ -28,8 +37,19 @@ def x_pos(x):
 	return np.maximum(x, 0)
 
 class DagumGeneralNetWealth():
-	def __init__(self):
-		pass
+	EPSILON = 1e-9
+	LOWER_BOUNDS = [EPSILON, 0, EPSILON, EPSILON, EPSILON, EPSILON, 1 + EPSILON]
+	UPPER_BOUNDS = [1, 1, 100, np.inf, 100, 100, 100]
+	TOLERANCE = 1e-6
+	PARAM_NAMES = ('b1', 'b2', 'c', 'l', 's', 'beta', 'delta')
+	# Parameters fitted to grouped data by default, the others are held at their initial values
+	GROUPED_FREE_PARAMS = ('b1', 'l', 'beta', 'delta')
+
+	def __init__(self, cache=None):
+		# Optional utils.cache.DiskCache of fit results
+		self.cache = cache
+		self.fit_info = None
+		self.trace = None
 
 	def cdf(self, x, b1, b2, c, l, s, beta, delta):
 		"""
@@ -72,11 +92,12 @@ class DagumGeneralNetWealth():
   
 		x = np.asarray(x) 
   
-		F1 = np.zeros_like(x) 
+		# F1 and F2 have all of their mass at or below zero
+		F1 = np.ones_like(x, dtype=float)
 		neg_mask = x < 0
 		F1[neg_mask] = np.exp(-c * np.power(np.abs(x[neg_mask]), s))
 		
-		F2 = np.maximum(x / np.abs(x), 0)
+		F2 = np.where(x >= 0, 1.0, 0.0)
   
 		F3 = np.zeros_like(x)
 		pos_mask = x > 0
@@ -144,8 +165,156 @@ class DagumGeneralNetWealth():
   
 		return b1 * f1 + b2 * f2 + b3 * f3
 
+	def ppf(self, p, b1, b2, c, l, s, beta, delta):
+		"""
+        Calculates the Percent Point Function (inverse CDF) of the Dagum Generalized Distribution in closed form.
+
+        Probabilities up to b1 fall in the negative component, those in [b1, b1 + b2] on the atom at zero,
+        and the rest in the Dagum Type I component.
+
+        Parameters
+        ----------
+        p : array_like
+            Probabilities in [0, 1].
+        b1, b2, c, l, s, beta, delta : float
+            Parameters of the distribution, see `cdf`.
+
+        Returns
+        -------
+        ndarray
+            Quantiles at `p`, -inf at 0 and inf at 1.
+        """
+		b3 = 1 - b1 - b2
+		p = np.asarray(p, dtype=float)
+
+		x = np.zeros_like(p)
+		neg_mask = p < b1
+		pos_mask = p > b1 + b2
+		q = (p[pos_mask] - b1 - b2) / b3
+		with np.errstate(divide='ignore'):
+			x[neg_mask] = -np.power(-np.log(p[neg_mask] / b1) / c, 1 / s)
+			x[pos_mask] = np.power(l / np.expm1(-np.log(q) / beta), 1 / delta)
+
+		return x
+
+	def moment(self, r, b1, b2, c, l, s, beta, delta):
+		"""
+        Calculates the raw moment E[X^r] of the Dagum Generalized Distribution in closed form.
+
+        The negative component is a reflected Weibull with moments c^(-r/s) Gamma(1 + r/s), and the
+        Dagum Type I component has moments beta l^(r/delta) B(beta + r/delta, 1 - r/delta), finite
+        only for r < delta.
+
+        Parameters
+        ----------
+        r : int
+            Order of the moment. Must be a non-negative integer.
+        b1, b2, c, l, s, beta, delta : float or ndarray
+            Parameters of the distribution, see `cdf`. Arrays of parameters broadcast together.
+
+        Returns
+        -------
+        float or ndarray
+            The r-th raw moment, inf if it does not exist.
+        """
+		assert r >= 0 and int(r) == r, f"Order r must be a non-negative integer, current value: {r}"
+		if r == 0:
+			return 1.0
+		b3 = 1 - b1 - b2
+		negative_moment = (-1) ** r * np.power(c, -r / s) * gamma(1 + r / s)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			positive_moment = np.where(r < delta, beta * np.power(l, r / delta) * beta_function(beta + r / delta, 1 - r / delta), np.inf)
+		# The atom at zero contributes nothing to moments of order r > 0
+		return b1 * negative_moment + b3 * positive_moment
+
+	def mean(self, b1, b2, c, l, s, beta, delta):
+		"""
+        Calculates the mean of the Dagum Generalized Distribution in closed form.
+
+        Parameters
+        ----------
+        b1, b2, c, l, s, beta, delta : float
+            Parameters of the distribution, see `cdf`.
+
+        Returns
+        -------
+        float
+            Mean of the distribution.
+        """
+		return self.moment(1, b1, b2, c, l, s, beta, delta)
 
-	def log_likelihood(self, params, x):
+	def gini(self, b1, b2, c, l, s, beta, delta):
+		"""
+        Calculates the Gini ratio of the Dagum Generalized Distribution in closed form.
+
+        Uses G = E|X - X'| / (2 mean), decomposing the mean difference over pairs of mixture components.
+        With negative net wealth the ratio can exceed one.
+
+        Parameters
+        ----------
+        b1, b2, c, l, s, beta, delta : float
+            Parameters of the distribution, see `cdf`.
+
+        Returns
+        -------
+        float
+            Gini ratio of the distribution.
+        """
+		b3 = 1 - b1 - b2
+		# Means of the absolute values of the negative and positive components
+		mean_negative = np.power(c, -1 / s) * gamma(1 + 1 / s)
+		mean_positive = self.moment(1, 0, 0, c, l, s, beta, delta)
+		gini_negative = 1 - np.power(2, -1 / s)
+		gini_positive = gamma(beta) * gamma(2 * beta + 1 / delta) / (gamma(2 * beta) * gamma(beta + 1 / delta)) - 1
+
+		mean_difference = (
+			b1 ** 2 * 2 * mean_negative * gini_negative
+			+ b3 ** 2 * 2 * mean_positive * gini_positive
+			+ 2 * b1 * b2 * mean_negative
+			+ 2 * b2 * b3 * mean_positive
+			+ 2 * b1 * b3 * (mean_negative + mean_positive)
+		)
+		mean = b3 * mean_positive - b1 * mean_negative
+		return mean_difference / (2 * mean)
+
+	def lorenz(self, p, b1, b2, c, l, s, beta, delta):
+		"""
+        Calculates the Lorenz curve of the Dagum Generalized Distribution in closed form.
+
+        The partial means of the negative and positive components are regularized incomplete Gamma and
+        Beta functions respectively, so the curve is evaluated without numerical integration.
+
+        Parameters
+        ----------
+        p : array_like
+            Population shares in [0, 1] at which to evaluate the Lorenz curve.
+        b1, b2, c, l, s, beta, delta : float
+            Parameters of the distribution, see `cdf`.
+
+        Returns
+        -------
+        ndarray
+            Share of total wealth held by the poorest `p` of the population.
+        """
+		b3 = 1 - b1 - b2
+		p = np.asarray(p, dtype=float)
+		mean_negative = np.power(c, -1 / s) * gamma(1 + 1 / s)
+		mean_positive = self.moment(1, 0, 0, c, l, s, beta, delta)
+		mean = b3 * mean_positive - b1 * mean_negative
+
+		# Partial mean of the negative component up to its quantile F1^-1(p / b1)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			negative_share = np.clip(p / b1, 0, 1)
+			negative_partial = -b1 * mean_negative * gammaincc(1 + 1 / s, -np.log(negative_share))
+
+			# Partial mean of the positive component up to its quantile F3^-1(u)
+			u = np.clip((p - b1 - b2) / b3, 0, 1)
+			positive_partial = b3 * mean_positive * betainc(beta + 1 / delta, 1 - 1 / delta, np.power(u, 1 / beta))
+
+		partial = np.where(p <= b1, negative_partial, -b1 * mean_negative + positive_partial)
+		return partial / mean
+
+	def log_likelihood(self, params, x, weights=None):
 		"""
         Computes the negative log-likelihood of the given data under the Dagum Generalized Distribution.
 
@@ -155,6 +324,8 @@ class DagumGeneralNetWealth():
             Parameters of the distribution (b1, b2, c, l, s, beta, delta).
         x : array_like
             Array of data points for which to compute the log-likelihood.
+        weights : array_like, optional
+            Frequency weight of each data point, e.g. the multiplicity of each unique value.
 
         Returns
         -------
@@ -165,9 +336,28 @@ class DagumGeneralNetWealth():
 		pdf_values = self.pdf(x, b1, b2, c, l, s, beta, delta)
 		# To avoid log of zero
 		pdf_values = np.where(pdf_values <= 0, np.finfo(float).eps, pdf_values)
-		return -np.sum(np.log(pdf_values))
+		if weights is None:
+			return -np.sum(np.log(pdf_values))
+		return -np.sum(weights * np.log(pdf_values))
+
+	def _minimize(self, x, initial_params, weights=None, options=None, trace=None):
+		# Define constraints and bounds
+		# Keep iterates inside the bounds, the pdf asserts on infeasible parameters
+		bounds = Bounds(self.LOWER_BOUNDS, self.UPPER_BOUNDS, keep_feasible=True)
+		cons = (
+				{'type': 'ineq', 'fun': lambda params: 1 - params[0] - params[1]}  # b3 = 1 - b1 - b2 > 0
+			)
+		if options is None:
+			options = {'disp': True, 'maxiter': 10_000}
 
-	def fit(self, x, initial_params):
+		objective, callback = self.log_likelihood, None
+		if trace is not None:
+			objective, callback = trace.wrap(self.log_likelihood), trace.callback
+
+		# Optimize
+		return minimize(objective, initial_params, args=(x, weights), method='trust-constr', constraints=cons, bounds=bounds, options=options, tol=self.TOLERANCE, callback=callback)
+
+	def fit(self, x, initial_params, weights=None, options=None, max_seconds=None, trace=None):
 		"""
         Fits the Dagum Generalized Distribution to a given dataset by optimizing the distribution parameters.
 
@@ -177,6 +367,15 @@ class DagumGeneralNetWealth():
             Array of data points to fit the distribution to.
         initial_params : tuple of float
             Initial guess for the distribution parameters (b1, b2, c, l, s, beta, delta).
+        weights : array_like, optional
+            Frequency weight of each data point. Defaults to one per point.
+        options : dict, optional
+            Solver options passed to `scipy.optimize.minimize`. Defaults to {'disp': True, 'maxiter': 10_000}.
+        max_seconds : float, optional
+            Wall-clock budget. When it is spent the fit stops and returns the best parameters so far.
+        trace : utils.fit_trace.FitTrace, optional
+            Trace to record the optimizer iterations into. A non-empty trace, e.g. a checkpoint loaded with
+            `FitTrace.load`, resumes the fit from its best parameters. Defaults to a new in-memory trace.
 
         Returns
         -------
@@ -187,21 +386,282 @@ class DagumGeneralNetWealth():
         ------
         Exception
             If optimization fails, an exception is raised with the failure message.
+
+        Notes
+        -----
+        If the model has a cache, results are keyed on a hash of the data, weights, initial parameters,
+        bounds and solver options, and an unchanged fit returns the stored parameters without optimizing.
+        The optimizer metadata and timing of the fit are available in `fit_info` either way, and the
+        iteration history of the last optimization in `trace`.
         """ 
-		# Define constraints and bounds
-		epsilon = 1e-9
-		bounds = [(epsilon, 1), (0, 1), (epsilon, 100), (epsilon, None), (epsilon, 100), (epsilon, 100), (1 + epsilon, 100)]
-		cons = (
-				{'type': 'ineq', 'fun': lambda params: 1 - params[0] - params[1]}  # b3 = 1 - b1 - b2 > 0
+		if trace is None:
+			trace = FitTrace()
+		elif len(trace):
+			# Resume from the best iterate of the checkpoint
+			initial_params = trace.best_params
+		self.trace = trace
+
+		key = None
+		if self.cache is not None:
+			key = hash_inputs(
+				'DagumGeneralNetWealth.fit',
+				np.asarray(x, dtype=float),
+				None if weights is None else np.asarray(weights, dtype=float),
+				np.asarray(initial_params, dtype=float),
+				self.LOWER_BOUNDS, self.UPPER_BOUNDS, self.TOLERANCE, options
 			)
+			cached = self.cache.get_json(key)
+			if cached is not None:
+				self.fit_info = cached
+				return np.array(cached['params'])
 
-		# Optimize
-		result = minimize(self.log_likelihood, initial_params, args=(x,), method='trust-constr', constraints=cons, bounds=bounds, options={'disp': True, 'maxiter': 10_000}, tol=1e-6)
+		start = time.perf_counter()
+		trace.start(max_seconds)
+		result = self._minimize(x, initial_params, weights, options, trace)
+		execution_time = time.perf_counter() - start
+		if trace.path is not None:
+			trace.save()
+
+		self.fit_info = {
+			'params': result.x.tolist(),
+			'success': bool(result.success),
+			'status': int(result.status),
+			'message': result.message,
+			'fun': float(result.fun),
+			'nit': int(result.nit),
+			'nfev': int(result.nfev),
+			'execution_time': execution_time,
+			'stopped_early': trace.stopped_early,
+		}
 
-		if result.success:
+		if trace.stopped_early:
+			# Out of time, return the best parameters so far
+			fitted_params = trace.best_params
+			self.fit_info['params'] = fitted_params.tolist()
+			self.fit_info['fun'] = trace.best_objective
+			print(f'Optimization stopped after {execution_time:.1f} s, returning the best parameters so far')
+			return fitted_params
+		elif result.success:
 			fitted_params = result.x
 		else:
 			print(result.x)
 			raise Exception('Optimization failed: ' + result.message)
 
-		return fitted_params
\ No newline at end of file
+		if key is not None:
+			self.cache.put_json(key, self.fit_info)
+
+		return fitted_params
+
+	def group_means(self, bounds, b1, b2, c, l, s, beta, delta):
+		"""
+        Calculates the mean of the distribution within rank groups in closed form, from the Lorenz curve.
+
+        Parameters
+        ----------
+        bounds : array_like
+            Increasing ranks in [0, 1] bounding the groups, one more than the number of groups.
+        b1, b2, c, l, s, beta, delta : float or ndarray
+            Parameters of the distribution, see `cdf`. Arrays of n parameter sets give the group means of each set.
+
+        Returns
+        -------
+        ndarray
+            Mean of every group, of shape (groups,) or (groups, n).
+        """
+		bounds = np.asarray(bounds, dtype=float)
+		bounds = bounds.reshape(bounds.shape + (1,) * np.ndim(l))
+		lorenz = self.lorenz(bounds, b1, b2, c, l, s, beta, delta)
+		return self.mean(b1, b2, c, l, s, beta, delta) * np.diff(lorenz, axis=0) / np.diff(bounds, axis=0)
+
+	def fit_grouped(self, group_means, population_shares, initial_params, free=GROUPED_FREE_PARAMS, block_size=8, scale=1_000_000):
+		"""
+        Fits the distribution to the group means of every period of grouped data, e.g. the FED quarters.
+
+        The parameters `free` of every period are chosen so that the group means implied by the distribution
+        match the observed ones, minimizing the squared relative errors. The other parameters are held at
+        their values in `initial_params`; with five groups only a few parameters are identified, so the
+        shape of the negative and null wealth is best taken from a fit to microdata.
+
+        The periods are solved a block at a time: the objective of a block evaluates all of its periods in
+        one vectorized call, and as the periods are independent the Jacobian is block diagonal, so its
+        finite differences cost one call per free parameter whatever the size of the block. Every block is
+        warm started from the last solution of the previous one. The free parameters are fitted in logs,
+        within the bounds of the model.
+
+        Parameters
+        ----------
+        group_means : DataFrame
+            Mean wealth of each group, one column per group from the bottom up, one row per period.
+        population_shares : array_like
+            Share of the population in each group, in the order of the columns, summing to 1.
+        initial_params : tuple of float
+            Parameters (b1, b2, c, l, s, beta, delta) in units of `scale`, the initial guess of the first period.
+        free : tuple of str
+            Names of the fitted parameters, see `PARAM_NAMES`.
+        block_size : int
+            Number of consecutive periods solved together.
+        scale : float
+            Units of `group_means` per unit of the parameters.
+
+        Returns
+        -------
+        DataFrame
+            The parameters of every period, indexed as `group_means`, and the largest relative error of
+            its group means in 'max_error'.
+        """
+		shares = np.asarray(population_shares, dtype=float)
+		bounds = np.concatenate([[0], np.cumsum(shares)])
+		bounds[-1] = 1
+		observed = group_means.to_numpy(dtype=float) / scale
+		free_index = [self.PARAM_NAMES.index(name) for name in free]
+
+		with np.errstate(divide='ignore'):
+			lower = np.log(np.asarray(self.LOWER_BOUNDS, dtype=float)[free_index])
+			upper = np.log(np.asarray(self.UPPER_BOUNDS, dtype=float)[free_index])
+		# Strictly inside the bounds, as least_squares requires of the initial guess
+		start = np.clip(np.log(np.asarray(initial_params, dtype=float)[free_index]), np.nextafter(lower, upper), np.nextafter(upper, lower))
+
+		def params_of(log_free):
+			params = np.tile(np.asarray(initial_params, dtype=float), (len(log_free), 1))
+			params[:, free_index] = np.exp(log_free)
+			return params
+
+		def relative_errors(log_free, block):
+			params = params_of(log_free.reshape(len(block), -1))
+			return self.group_means(bounds, *params.T).T / block - 1
+
+		fitted = np.empty((len(observed), len(free)))
+		max_errors = np.empty(len(observed))
+		for first in range(0, len(observed), block_size):
+			block = observed[first:first + block_size]
+			n = len(block)
+			sparsity = block_diag([np.ones((len(shares), len(free)))] * n)
+			result = least_squares(
+				lambda log_free: relative_errors(log_free, block).ravel(), np.tile(start, n),
+				bounds=(np.tile(lower, n), np.tile(upper, n)), jac_sparsity=sparsity, x_scale='jac'
+			)
+			fitted[first:first + n] = result.x.reshape(n, -1)
+			max_errors[first:first + n] = np.abs(relative_errors(result.x, block)).max(axis=1)
+			start = fitted[first + n - 1]
+
+		table = pd.DataFrame(params_of(fitted), index=group_means.index, columns=list(self.PARAM_NAMES))
+		table['max_error'] = max_errors
+		return table
+
+	def bootstrap(self, x, fitted_params, n_replicates=1000, confidence=0.95, method='bca', n_jobs=None, seed=None, n_jackknife_blocks=20, options=None):
+		"""
+        Bootstraps confidence intervals for the distribution parameters.
+
+        Resamples are drawn as multinomial count vectors over the unique values of `x`, so every replicate
+        is a weighted fit over the unique values instead of a copied array. Replicates are fitted in a
+        process pool, each warm started from the full-sample MLE.
+
+        Parameters
+        ----------
+        x : array_like
+            Array of data points the distribution was fitted to.
+        fitted_params : tuple of float
+            Full-sample MLE (b1, b2, c, l, s, beta, delta), e.g. the output of `fit`.
+        n_replicates : int
+            Number of bootstrap replicates.
+        confidence : float
+            Confidence level of the intervals.
+        method : {'bca', 'percentile'}
+            Interval method. BCa estimates the acceleration with a delete-a-block jackknife.
+        n_jobs : int, optional
+            Number of worker processes. Defaults to the number of CPUs.
+        seed : int, optional
+            Seed for the resampling.
+        n_jackknife_blocks : int
+            Number of blocks of the jackknife used by the BCa method.
+        options : dict, optional
+            Solver options for each replicate. Defaults to {'maxiter': 1_000}.
+
+        Returns
+        -------
+        lower : ndarray
+            Lower confidence bound of each parameter.
+        upper : ndarray
+            Upper confidence bound of each parameter.
+        replicates : ndarray
+            Fitted parameters of each replicate, shape (n_replicates, 7). Failed fits are NaN.
+        """
+		if method not in ('bca', 'percentile'):
+			raise ValueError(f"Unknown interval method: {method}")
+		if options is None:
+			options = {'maxiter': 1_000}
+
+		x = np.asarray(x, dtype=float)
+		values, counts = np.unique(x, return_counts=True)
+		fitted_params = np.asarray(fitted_params, dtype=float)
+
+		seed_sequence = np.random.SeedSequence(seed)
+		replicate_seeds = seed_sequence.spawn(n_replicates)
+
+		initargs = (values, counts, fitted_params, options)
+		n_jobs = n_jobs or os.cpu_count()
+		chunksize = max(1, n_replicates // (4 * n_jobs))
+		with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_bootstrap_worker, initargs=initargs) as executor:
+			replicates = np.array(list(executor.map(_bootstrap_replicate, replicate_seeds, chunksize=chunksize)))
+
+			if method == 'bca':
+				# Delete-a-block jackknife: split the observations into blocks and drop one block per fit
+				rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+				observations = rng.permutation(np.repeat(np.arange(len(values)), counts))
+				jackknife_weights = [
+					counts - np.bincount(block, minlength=len(values))
+					for block in np.array_split(observations, n_jackknife_blocks)
+				]
+				jackknife = np.array(list(executor.map(_fit_weighted_replicate, jackknife_weights)))
+
+		failed = np.isnan(replicates).any(axis=1)
+		if failed.any():
+			print(f"Bootstrap: {failed.sum()} of {n_replicates} replicates failed to converge")
+
+		tail = (1 - confidence) / 2
+		if method == 'percentile':
+			lower, upper = np.nanpercentile(replicates, [100 * tail, 100 * (1 - tail)], axis=0)
+			return lower, upper, replicates
+
+		# Bias correction, counting ties as half
+		valid = replicates[~failed]
+		proportion = (np.sum(valid < fitted_params, axis=0) + 0.5 * np.sum(valid == fitted_params, axis=0)) / len(valid)
+		z0 = norm.ppf(proportion)
+
+		# Acceleration
+		jackknife = jackknife[~np.isnan(jackknife).any(axis=1)]
+		deviations = np.mean(jackknife, axis=0) - jackknife
+		denominator = 6 * np.power(np.sum(deviations ** 2, axis=0), 1.5)
+		a = np.divide(np.sum(deviations ** 3, axis=0), denominator, out=np.zeros_like(denominator), where=denominator > 0)
+
+		z = norm.ppf([tail, 1 - tail])[:, None]
+		adjusted = norm.cdf(z0 + (z0 + z) / (1 - a * (z0 + z)))
+		lower = np.array([np.percentile(valid[:, i], 100 * adjusted[0, i]) for i in range(valid.shape[1])])
+		upper = np.array([np.percentile(valid[:, i], 100 * adjusted[1, i]) for i in range(valid.shape[1])])
+		return lower, upper, replicates
+
+
+# Per-process state of the bootstrap workers, set once by the pool initializer so that each task only ships a seed
+_bootstrap_state = {}
+
+def _init_bootstrap_worker(values, counts, fitted_params, options):
+	_bootstrap_state.update(values=values, counts=counts, fitted_params=fitted_params, options=options, model=DagumGeneralNetWealth())
+
+def _fit_weighted_replicate(weights):
+	state = _bootstrap_state
+	# Values drawn zero times do not contribute to the likelihood
+	mask = weights > 0
+	try:
+		result = state['model']._minimize(state['values'][mask], state['fitted_params'], weights[mask], state['options'])
+	except (AssertionError, ValueError):
+		return np.full(len(state['fitted_params']), np.nan)
+	if not result.success:
+		return np.full(len(state['fitted_params']), np.nan)
+	return result.x
+
+def _bootstrap_replicate(seed):
+	state = _bootstrap_state
+	rng = np.random.default_rng(seed)
+	counts = state['counts']
+	weights = rng.multinomial(counts.sum(), counts / counts.sum())
+	return _fit_weighted_replicate(weights)
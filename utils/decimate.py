@@ -0,0 +1,96 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy.special import expit, logit
+
+def symlog10(x):
+	"""
+	Symmetric log10, sign(x) * log10(1 + |x|), finite and monotonic over the whole real line.
+	"""
+	x = np.asarray(x, dtype=float)
+	return np.sign(x) * np.log10(1 + np.abs(x))
+
+def log_decade_indices(sorted_values, points_per_decade=50):
+	"""
+	Thins a sorted array to at most `points_per_decade` points per decade of its values.
+
+	The values are binned on a symmetric log10 scale, so negative and positive values are thinned alike and
+	the bins near zero are linear. The first point of every non-empty bin is kept, as well as the last point.
+
+	Parameters
+	----------
+	sorted_values : array_like
+		Values sorted in ascending order.
+	points_per_decade : int
+		Bins per decade.
+
+	Returns
+	-------
+	ndarray
+		Ascending indices of the kept points.
+	"""
+	bins = np.floor(symlog10(sorted_values) * points_per_decade)
+	if len(bins) == 0:
+		return np.empty(0, dtype=int)
+	keep = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+	if keep[-1] != len(bins) - 1:
+		keep = np.append(keep, len(bins) - 1)
+	return keep
+
+def quantile_thin_indices(n, max_points=2000, tail_points=100):
+	"""
+	Thins n sorted points to at most `max_points`, keeping both tails exactly.
+
+	The first and last `tail_points` points are always kept. In between, the kept ranks are spaced evenly
+	in the logit of their quantile, so the thinning is densest towards the tails and sparsest around the
+	median, where neighbouring points of an ECDF are indistinguishable anyway.
+
+	Parameters
+	----------
+	n : int
+		Number of points.
+	max_points : int
+		Bound on the number of kept points.
+	tail_points : int
+		Points kept exactly at each end, at most a quarter of `max_points`.
+
+	Returns
+	-------
+	ndarray
+		Ascending indices of the kept points.
+	"""
+	if n <= max_points:
+		return np.arange(n)
+	tail_points = min(tail_points, max_points // 4)
+	first, last = tail_points, n - tail_points - 1
+
+	quantile_bounds = (np.array([first, last]) + 0.5) / n
+	middle = np.rint(expit(np.linspace(*logit(quantile_bounds), max_points - 2 * tail_points)) * n - 0.5).astype(int)
+	middle = np.clip(middle, first, last)
+	return np.unique(np.concatenate([np.arange(tail_points), middle, np.arange(n - tail_points, n)]))
+
+def plot_decimated(x, y, ax=None, max_points=2000, tail_points=100, rasterized=False, **kwargs):
+	"""
+	Plots points sorted by rank, e.g. an empirical CDF, thinned with `quantile_thin_indices`.
+
+	Parameters
+	----------
+	x, y : array_like
+		Coordinates of the points, in rank order.
+	ax : Axes, optional
+		Axes to draw on. Defaults to the current axes.
+	max_points, tail_points : int
+		See `quantile_thin_indices`.
+	rasterized : bool
+		Rasterize the artist when saving to a vector format.
+	**kwargs
+		Passed to `Axes.plot`.
+
+	Returns
+	-------
+	list of Line2D
+		As `Axes.plot`.
+	"""
+	if ax is None:
+		ax = plt.gca()
+	indices = quantile_thin_indices(len(x), max_points, tail_points)
+	return ax.plot(np.asarray(x)[indices], np.asarray(y)[indices], rasterized=rasterized, **kwargs)
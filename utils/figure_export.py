@@ -0,0 +1,207 @@
+import atexit
+import glob
+import inspect
+import io
+import os
+import threading
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.cache import hash_inputs
+
+class FigureExporter:
+	"""
+	Saves numbered figures to a directory, encoding the PNGs in background threads.
+
+	`save` renders the figure to a raw RGBA buffer on the calling thread, which is all that needs the
+	figure, and hands the buffer to a thread pool for the PNG encoding and the write. Computation and
+	plotting continue while earlier figures are encoded. At most `max_pending` buffers are held at a
+	time; `save` blocks once that many are waiting. Files keep the `{count}_{name}` numbering of the
+	scripts' `save_fig`. Everything is flushed at interpreter exit and pending encodes finish before the
+	process forks; call `flush` before reading the files back.
+
+	With a cache, a section can skip rendering entirely when neither its code nor its inputs changed:
+
+		if not exporter.restore('plot.png', data):
+			... plot ...
+			save_fig(plt, 'plot.png')
+
+	`restore` hashes the source of the enclosing `# %%` cell and the given inputs. On a hit the stored
+	file is written to the next numbered slot; on a miss the next `save` of that name stores its output
+	under the hash. Every `save` removes stale files left in its slot by earlier runs under other names.
+
+	Parameters
+	----------
+	directory : str
+		Output directory, created if missing.
+	max_pending : int
+		Bound on the number of rendered figures waiting to be encoded.
+	workers : int, optional
+		Number of encoding threads. Defaults to the number of CPUs.
+	cache : DiskCache, optional
+		Content-addressed store of previously written files.
+	"""
+
+	def __init__(self, directory, max_pending=8, workers=None, cache=None):
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+		self.count = 0
+		self.cache = cache
+
+		self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+		self._slots = threading.BoundedSemaphore(max_pending)
+		self._futures = []
+		# Keys of restore misses, stored by the next save of the same name
+		self._pending_keys = {}
+		self._cache_lock = threading.Lock()
+		atexit.register(self.flush)
+		# Forked children should not inherit a figure half-way through encoding
+		if hasattr(os, 'register_at_fork'):
+			os.register_at_fork(before=lambda: wait(self._futures))
+
+	def restore(self, name, *inputs, numbered=True):
+		"""
+		Restores a cached output of the calling `# %%` cell.
+
+		Parameters
+		----------
+		name : str
+			File name, as passed to `save`, or of an unnumbered file written by the cell itself.
+		*inputs
+			Data the cell plots, anything `utils.cache.hash_inputs` accepts.
+		numbered : bool
+			Whether the file takes the next `{count}_{name}` slot. Unnumbered files, e.g. animations
+			rendered by other means, are stored with `store` after they are written.
+
+		Returns
+		-------
+		bool
+			True if the file was restored and the cell can skip rendering.
+		"""
+		if self.cache is None:
+			return False
+		caller = inspect.stack()[1]
+		cell_source = _cell_source(caller.filename, caller.lineno)
+		if cell_source is None:
+			return False
+
+		key = hash_inputs('FigureExporter', name, numbered, mpl.rcParams['savefig.dpi'], cell_source, *inputs)
+		with self._cache_lock:
+			data = self.cache.get(key)
+		if data is None:
+			self._pending_keys[name] = key
+			return False
+
+		path = self._next_path(name) if numbered else os.path.join(self.directory, name)
+		with open(path, 'wb') as file:
+			file.write(data)
+		return True
+
+	def save(self, fig, name, dpi=None, numbered=True):
+		"""
+		Renders `fig` and queues it to be written as `{count}_{name}`, or as `name` if not numbered.
+
+		Parameters
+		----------
+		fig : Figure
+			The figure, e.g. `plt.gcf()`.
+		name : str
+			File name, with a .png extension.
+		dpi : float, optional
+			Resolution. Defaults to rcParams['savefig.dpi'].
+		numbered : bool
+			Whether the file takes the next `{count}_{name}` slot.
+
+		Returns
+		-------
+		str
+			Path of the file being written.
+		"""
+		if dpi is None:
+			dpi = mpl.rcParams['savefig.dpi']
+		if dpi == 'figure':
+			dpi = fig.dpi
+
+		buffer = io.BytesIO()
+		fig.savefig(buffer, format='rgba', dpi=dpi)
+		width = int(fig.get_figwidth() * dpi)
+		rgba = np.frombuffer(buffer.getbuffer(), dtype=np.uint8).reshape(-1, width, 4)
+
+		if numbered:
+			path = self._next_path(name)
+			self._prune_slot(path)
+		else:
+			path = os.path.join(self.directory, name)
+		key = self._pending_keys.pop(name, None)
+
+		self._slots.acquire()
+		future = self._executor.submit(self._write_png, path, rgba, dpi, key)
+		future.add_done_callback(lambda _: self._slots.release())
+		self._futures.append(future)
+		return path
+
+	def store(self, name):
+		"""
+		Stores an unnumbered file written after a `restore(name, ..., numbered=False)` miss.
+		"""
+		key = self._pending_keys.pop(name, None)
+		if key is None or self.cache is None:
+			return
+		with open(os.path.join(self.directory, name), 'rb') as file:
+			data = file.read()
+		with self._cache_lock:
+			self.cache.put(key, data)
+
+	def flush(self):
+		"""
+		Waits until every queued figure is written, raising the first encoding error.
+		"""
+		futures, self._futures = self._futures, []
+		for future in futures:
+			future.result()
+
+	def _next_path(self, name):
+		path = os.path.join(self.directory, f'{self.count}_{name}')
+		self.count += 1
+		return path
+
+	def _prune_slot(self, path):
+		# Files of earlier runs numbered like this one but under another name
+		slot = os.path.basename(path).split('_', 1)[0]
+		for stale_path in glob.glob(os.path.join(self.directory, f'{slot}_*')):
+			if stale_path != path:
+				os.remove(stale_path)
+
+	def _write_png(self, path, rgba, dpi, key):
+		buffer = io.BytesIO()
+		plt.imsave(buffer, rgba, format='png', dpi=dpi)
+		data = buffer.getvalue()
+		with open(path, 'wb') as file:
+			file.write(data)
+		if key is not None:
+			with self._cache_lock:
+				self.cache.put(key, data)
+
+# Source lines of the scripts by file, re-read when the file is modified between cell runs
+_script_lines = {}
+
+def _cell_source(filename, lineno):
+	# Text of the `# %%` cell around a line, None for code not read from a file
+	try:
+		modified = os.path.getmtime(filename)
+		if _script_lines.get(filename, (None,))[0] != modified:
+			with open(filename) as file:
+				_script_lines[filename] = (modified, file.read().splitlines())
+	except OSError:
+		return None
+	lines = _script_lines[filename][1]
+
+	is_marker = [line.strip().startswith(('# %%', '#%%')) for line in lines]
+	start = lineno - 1
+	while start > 0 and not is_marker[start]:
+		start -= 1
+	end = lineno
+	while end < len(lines) and not is_marker[end]:
+		end += 1
+	return '\n'.join(lines[start:end])
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+class FitTrace():
+	"""
+	In-memory record of an optimizer run for `DagumGeneralNetWealth.fit`.
+
+	Every iteration stores the objective, parameter vector, gradient norm, wall-clock time and
+	objective evaluation counts. A trace can be checkpointed to a JSON file while the fit runs and
+	loaded again to resume the fit from its best parameters.
+	"""
+	COLUMNS = ['iteration', 'objective', 'gradient_norm', 'elapsed', 'evaluations', 'evaluation_time']
+
+	def __init__(self, path=None, checkpoint_interval=30):
+		# JSON file the trace is checkpointed to, every `checkpoint_interval` seconds
+		self.path = path
+		self.checkpoint_interval = checkpoint_interval
+		self.records = {column: [] for column in self.COLUMNS}
+		self.params = []
+		self.stopped_early = False
+
+	def __len__(self):
+		return len(self.params)
+
+	@property
+	def best_index(self):
+		return int(np.argmin(self.records['objective']))
+
+	@property
+	def best_params(self):
+		return np.array(self.params[self.best_index])
+
+	@property
+	def best_objective(self):
+		return self.records['objective'][self.best_index]
+
+	def start(self, max_seconds=None):
+		# Continue counting from the end of a resumed trace
+		last = {column: values[-1] if values else 0 for column, values in self.records.items()}
+		self._iteration_offset = last['iteration']
+		self._evaluations = last['evaluations']
+		self._evaluation_time = last['evaluation_time']
+		self._elapsed_offset = last['elapsed']
+		self._max_seconds = max_seconds
+		self._start = time.perf_counter()
+		self._last_checkpoint = self._start
+		self.stopped_early = False
+
+	def wrap(self, fun):
+		"""Wrap an objective function so every evaluation is counted and timed."""
+		def wrapped(*args):
+			start = time.perf_counter()
+			value = fun(*args)
+			self._evaluation_time += time.perf_counter() - start
+			self._evaluations += 1
+			return value
+		return wrapped
+
+	def callback(self, xk, state):
+		"""Optimizer callback recording one iteration. Returns True to stop once the time budget is spent."""
+		now = time.perf_counter()
+		grad = getattr(state, 'grad', None)
+		self.records['iteration'].append(self._iteration_offset + int(state.nit))
+		self.records['objective'].append(float(state.fun))
+		self.records['gradient_norm'].append(float(np.linalg.norm(grad)) if grad is not None else np.nan)
+		self.records['elapsed'].append(self._elapsed_offset + now - self._start)
+		self.records['evaluations'].append(self._evaluations)
+		self.records['evaluation_time'].append(self._evaluation_time)
+		self.params.append(np.asarray(xk, dtype=float).tolist())
+
+		if self.path is not None and now - self._last_checkpoint >= self.checkpoint_interval:
+			self.save()
+			self._last_checkpoint = now
+
+		if self._max_seconds is not None and now - self._start >= self._max_seconds:
+			self.stopped_early = True
+			return True
+		return False
+
+	def to_dataframe(self):
+		df = pd.DataFrame(self.records)
+		df['params'] = self.params
+		return df
+
+	def save(self, path=None):
+		path = path or self.path
+		tmp_path = f'{path}.tmp'
+		with open(tmp_path, 'w') as file:
+			json.dump({'records': self.records, 'params': self.params}, file)
+		os.replace(tmp_path, path)
+
+	@classmethod
+	def load(cls, path, checkpoint_interval=30):
+		trace = cls(path, checkpoint_interval)
+		with open(path, 'r') as file:
+			contents = json.load(file)
+		trace.records = contents['records']
+		trace.params = contents['params']
+		return trace
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+def goodness_of_fit(sorted_data, model_cdfs):
+	"""
+	Scores candidate model CDFs against the empirical CDF of a sorted sample in one vectorized pass.
+
+	Parameters
+	----------
+	sorted_data : array_like
+		Sample sorted in ascending order, length n.
+	model_cdfs : array_like
+		CDF values of K candidate models evaluated at `sorted_data`, shape (K, n) or (n,) for a single model.
+
+	Returns
+	-------
+	DataFrame
+		One row per candidate with columns:
+		SSE, the sum of squared differences to the empirical CDF i/n (as `utils.helper.ssd`),
+		KS, the Kolmogorov-Smirnov distance,
+		CvM, the Cramer-von Mises statistic,
+		AD, the Anderson-Darling statistic.
+	"""
+	n = len(sorted_data)
+	model_cdfs = np.atleast_2d(np.asarray(model_cdfs, dtype=float))
+	if model_cdfs.shape[1] != n:
+		raise ValueError(f"Model CDFs must have {n} columns, one per data point, got shape {model_cdfs.shape}.")
+
+	# Empirical CDF just after and just before each order statistic
+	i = np.arange(1, n + 1)
+	ecdf_upper = i / n
+	ecdf_lower = (i - 1) / n
+
+	sse = np.sum((ecdf_upper - model_cdfs) ** 2, axis=1)
+	ks = np.maximum(np.max(ecdf_upper - model_cdfs, axis=1), np.max(model_cdfs - ecdf_lower, axis=1))
+	cvm = 1 / (12 * n) + np.sum(((2 * i - 1) / (2 * n) - model_cdfs) ** 2, axis=1)
+
+	# Clip away from 0 and 1 to keep the logarithms finite
+	eps = np.finfo(float).eps
+	clipped = np.clip(model_cdfs, eps, 1 - eps)
+	ad = -n - np.sum((2 * i - 1) * (np.log(clipped) + np.log1p(-clipped[:, ::-1])), axis=1) / n
+
+	return pd.DataFrame({'SSE': sse, 'KS': ks, 'CvM': cvm, 'AD': ad})
@@ -1,30 +1,277 @@
 import numpy as np
+import pandas as pd
 
 # Calculate percentiles with variable granularity
 def calculate_percentiles(data, column_name, granularity, interpolation='linear'):
     """
     Calculate percentiles with variable granularity, including sub-integer granularity.
 
-    :param data: DataFrame containing the data.
-    :param column_name: The name of the column to calculate the percentiles for.
+    Each column is sorted once and all percentiles are computed in a single vectorized call.
+
+    :param data: DataFrame containing the data, or a dictionary of DataFrames by year.
+    :param column_name: The name of the column to calculate the percentiles for, or a list of names.
     :param granularity: The granularity for the percentiles (e.g., 0.1 for 0.1%, 5 for 5%).
-    :return: Dictionary of percentiles.
+    :param interpolation: The numpy percentile method (e.g., 'linear', 'nearest').
+    :return: DataFrame indexed by percentile with one column per column name. For a dictionary
+        of DataFrames the columns are a (year, column name) MultiIndex.
     """
-    if column_name not in data.columns:
-        raise ValueError(f"Column {column_name} does not exist in the data.")
-    
     if granularity <= 0 or granularity > 100:
         raise ValueError("Granularity must be between 0 (exclusive) and 100 (inclusive).")
-    
-    # Sort the data
-    sorted_values = data[column_name].sort_values().reset_index(drop=True)
-    
-    percentiles = {
-        p: np.percentile(sorted_values, p, interpolation=interpolation)
-        for p in np.arange(0, 100 + granularity, granularity)
-    }
-    return percentiles
+
+    column_names = [column_name] if isinstance(column_name, str) else list(column_name)
+    frames = data if isinstance(data, dict) else {None: data}
+
+    # Drop the float overshoot past 100 of the arange
+    percentiles = np.arange(0, 100 + granularity, granularity)
+    percentiles = np.minimum(percentiles[percentiles < 100 + granularity / 2], 100)
+
+    columns = {}
+    for year, frame in frames.items():
+        for name in column_names:
+            if name not in frame.columns:
+                raise ValueError(f"Column {name} does not exist in the data.")
+            sorted_values = np.sort(frame[name].to_numpy())
+            key = name if year is None else (year, name)
+            columns[key] = np.percentile(sorted_values, percentiles, method=interpolation)
+
+    percentiles_df = pd.DataFrame(columns, index=pd.Index(percentiles, name='Percentile'))
+    return percentiles_df
 
 def ssd(A,B):
     squares = (A - B) ** 2
-    return np.sum(squares)
\ No newline at end of file
+    return np.sum(squares)
+
+class QuantileSketch():
+    """
+    Mergeable streaming quantile sketch with bounded relative error (DDSketch).
+
+    Values are counted in logarithmically sized buckets, so any quantile is answered with a value
+    within `relative_accuracy` of the exact one. Memory is bounded by `max_buckets` per sign no
+    matter how many values are fed in; if the range of magnitudes needs more buckets, the buckets
+    closest to zero are collapsed. Sketches fed with different chunks, e.g. by different worker
+    processes, can be merged and serialized to plain dictionaries.
+
+    Example:
+        sketch = QuantileSketch()
+        for chunk in pd.read_csv(path, usecols=[column], chunksize=1_000_000):
+            sketch.update(chunk[column])
+        sketch.percentile(np.arange(0, 101))
+    """
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048, min_value=1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("Relative accuracy must be between 0 and 1 (exclusive).")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        # Values with a smaller magnitude are counted as zero
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.positive = _BucketStore(max_buckets)
+        self.negative = _BucketStore(max_buckets)
+        self.zero_count = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """
+        Add a chunk of values to the sketch.
+
+        :param values: Array-like of values. NaNs are ignored.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        magnitudes = np.abs(values)
+        indexable = magnitudes >= self.min_value
+        positive = indexable & (values > 0)
+        negative = indexable & (values < 0)
+
+        self.positive.add(self._index(values[positive]))
+        self.negative.add(self._index(magnitudes[negative]))
+        self.zero_count += int(np.sum(~indexable))
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one.
+
+        :param other: QuantileSketch with the same relative accuracy.
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches with the same relative accuracy can be merged.")
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """
+        Estimate quantiles of all values seen so far.
+
+        :param q: Quantile or array of quantiles in [0, 1].
+        :return: Estimated quantile values, within the relative accuracy of the exact ones.
+        """
+        if self.count == 0:
+            raise ValueError("The sketch is empty.")
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError("Quantiles must be between 0 and 1 (inclusive).")
+
+        # Buckets in ascending order of value: negatives by decreasing magnitude, zero, positives
+        negative_indices, negative_counts = self.negative.buckets()
+        positive_indices, positive_counts = self.positive.buckets()
+        values = np.concatenate([
+            -self._value(negative_indices[::-1]),
+            [0.0],
+            self._value(positive_indices),
+        ])
+        counts = np.concatenate([negative_counts[::-1], [self.zero_count], positive_counts])
+
+        rank = q * (self.count - 1)
+        bucket = np.searchsorted(np.cumsum(counts), rank, side='right')
+        return np.clip(values[np.minimum(bucket, len(values) - 1)], self.min, self.max)
+
+    def percentile(self, p):
+        """
+        Estimate percentiles of all values seen so far.
+
+        :param p: Percentile or array of percentiles in [0, 100].
+        :return: Estimated percentile values.
+        """
+        return self.quantile(np.asarray(p, dtype=float) / 100)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_buckets': self.max_buckets,
+            'min_value': self.min_value,
+            'positive': self.positive.to_dict(),
+            'negative': self.negative.to_dict(),
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, contents):
+        sketch = cls(contents['relative_accuracy'], contents['max_buckets'], contents['min_value'])
+        sketch.positive = _BucketStore.from_dict(contents['positive'])
+        sketch.negative = _BucketStore.from_dict(contents['negative'])
+        sketch.zero_count = contents['zero_count']
+        sketch.count = contents['count']
+        sketch.min = contents['min']
+        sketch.max = contents['max']
+        return sketch
+
+    def _index(self, magnitudes):
+        # Bucket i holds magnitudes in (gamma^(i-1), gamma^i]
+        return np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+
+    def _value(self, indices):
+        # Representative value with relative error at most the relative accuracy for the whole bucket
+        return 2 * np.power(self.gamma, indices) / (self.gamma + 1)
+
+
+class _BucketStore():
+    # Dense bucket counts for a contiguous range of indices starting at offset
+    def __init__(self, max_buckets):
+        self.max_buckets = max_buckets
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, indices, counts=None):
+        if len(indices) == 0:
+            return
+        low = min(int(indices.min()), self.offset) if len(self.counts) else int(indices.min())
+        high = max(int(indices.max()), self.offset + len(self.counts) - 1) if len(self.counts) else int(indices.max())
+
+        combined = np.zeros(high - low + 1, dtype=np.int64)
+        combined[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+        combined += np.bincount(indices - low, weights=counts, minlength=len(combined)).astype(np.int64)
+        self.offset, self.counts = low, combined
+        self._collapse()
+
+    def merge(self, other):
+        indices, counts = other.buckets()
+        self.add(indices, counts)
+
+    def buckets(self):
+        nonzero = np.nonzero(self.counts)[0]
+        return nonzero + self.offset, self.counts[nonzero]
+
+    def _collapse(self):
+        # Fold the buckets closest to zero into the lowest kept bucket
+        excess = len(self.counts) - self.max_buckets
+        if excess > 0:
+            self.counts[excess] += self.counts[:excess].sum()
+            self.counts = self.counts[excess:]
+            self.offset += excess
+
+    def to_dict(self):
+        return {'max_buckets': self.max_buckets, 'offset': self.offset, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, contents):
+        store = cls(contents['max_buckets'])
+        store.offset = contents['offset']
+        store.counts = np.array(contents['counts'], dtype=np.int64)
+        return store
+
+
+def linregress_scan(x, y, start_indices=None):
+    """
+    Least-squares line fits of y on x over every suffix x[start:], y[start:] in O(n).
+
+    Cumulative sums of x, y, x^2, y^2 and xy are computed once (on data centered by the full-sample
+    means to limit cancellation), so each suffix costs O(1) instead of a new linregress call.
+
+    :param x: Array of x values.
+    :param y: Array of y values, same length as x.
+    :param start_indices: Start indices of the suffixes to fit. Defaults to every start leaving at least two points.
+    :return: DataFrame with columns start_index, n, slope, intercept and r_squared.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) != len(y):
+        raise ValueError("x and y must have the same length.")
+
+    if start_indices is None:
+        start_indices = np.arange(max(len(x) - 1, 0))
+    start_indices = np.asarray(start_indices, dtype=np.int64)
+
+    x_mean, y_mean = x.mean(), y.mean()
+    dx, dy = x - x_mean, y - y_mean
+
+    def suffix_sum(values):
+        return np.append(np.cumsum(values[::-1])[::-1], 0)[start_indices]
+
+    n = len(x) - start_indices
+    sum_x, sum_y = suffix_sum(dx), suffix_sum(dy)
+    sum_xx, sum_yy, sum_xy = suffix_sum(dx * dx), suffix_sum(dy * dy), suffix_sum(dx * dy)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s_xx = sum_xx - sum_x ** 2 / n
+        s_yy = sum_yy - sum_y ** 2 / n
+        s_xy = sum_xy - sum_x * sum_y / n
+        slope = s_xy / s_xx
+        # Intercept in the original, uncentered coordinates
+        intercept = (y_mean + sum_y / n) - slope * (x_mean + sum_x / n)
+        r_squared = s_xy ** 2 / (s_xx * s_yy)
+
+    return pd.DataFrame({
+        'start_index': start_indices,
+        'n': n,
+        'slope': slope,
+        'intercept': intercept,
+        'r_squared': r_squared,
+    })
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from scipy.interpolate import PchipInterpolator
+
+class ParetoInterpolation:
+	"""
+	Continuous quantile functions and top shares reconstructed from grouped wealth totals.
+
+	A generalized Pareto interpolation in the manner of Blanchet, Fournier and Piketty (2017). With
+	x = -log(1 - p) and Y(p) the wealth above rank p per person of the whole population,
+	φ(x) = -log Y(p) is known at the lower bound of every group. It is interpolated with a monotone
+	cubic (PCHIP) in x, and the quantile and top share at any rank follow in closed form:
+
+		Q(p) = φ'(x) exp(x - φ(x)),  S(p) = exp(-φ(x)) / mean
+
+	Above the last group φ is extended linearly, a Pareto tail with coefficient 1 / (1 - φ'). All
+	periods share the same group bounds, so one interpolator handles every period at once. As the
+	interpolation keeps φ increasing when every group holds positive wealth, the quantiles are not
+	negative; the negative wealth inside the bottom group is averaged away by the grouping.
+
+	Parameters
+	----------
+	group_means : DataFrame
+		Mean wealth per person of each group, one column per group from the bottom up, one row per period.
+	population_shares : array_like
+		Share of the population in each group, in the order of the columns, summing to 1.
+	"""
+
+	def __init__(self, group_means, population_shares):
+		shares = np.asarray(population_shares, dtype=float)
+		self.index = group_means.index
+		# Lower bound of every group in rank
+		self.bounds = np.concatenate([[0], np.cumsum(shares)[:-1]])
+
+		# Wealth above each bound per person of the whole population, periods x groups
+		contributions = group_means.to_numpy(dtype=float) * shares
+		top_wealth = np.cumsum(contributions[:, ::-1], axis=1)[:, ::-1]
+		if np.any(top_wealth <= 0):
+			raise ValueError("The wealth above every group bound must be positive.")
+		self.mean = pd.Series(top_wealth[:, 0], index=self.index)
+
+		self._x = -np.log1p(-self.bounds)
+		self._phi_knots = -np.log(top_wealth)
+		# The knots along the first axis, one curve per period
+		self._phi = PchipInterpolator(self._x, self._phi_knots.T, axis=0)
+		self._phi_derivative = self._phi.derivative()
+
+		# Slope of the Pareto tail, kept below 1 for a finite mean
+		self.tail_slope = np.minimum(self._phi_derivative(self._x[-1]), 1 - 1e-6)
+
+	@classmethod
+	def from_fed(cls, fed_data, unit='Population'):
+		"""
+		Interpolation of every quarter of loaded FED data.
+
+		Parameters
+		----------
+		fed_data : FedData
+			Loaded FED data.
+		unit : str
+			'Population' or 'Households', what the ranks and means are per.
+		"""
+		categories = list(fed_data.POPULATION_SIZES)
+		group_means = fed_data.get_per_capita_net_worth_data(unit)[categories]
+		return cls(group_means, [fed_data.POPULATION_SIZES[category] for category in categories])
+
+	def phi(self, p):
+		"""
+		φ and its derivative in x at the ranks `p`, arrays of shape (len(p), periods).
+		"""
+		with np.errstate(divide='ignore'):
+			x = -np.log1p(-np.atleast_1d(np.asarray(p, dtype=float)))
+		inside = x <= self._x[-1]
+
+		phi = np.empty((len(x), len(self.index)))
+		derivative = np.empty_like(phi)
+		phi[inside] = self._phi(x[inside])
+		derivative[inside] = self._phi_derivative(x[inside])
+
+		# Pareto tail above the last bound
+		tail_x = x[~inside, np.newaxis] - self._x[-1]
+		phi[~inside] = self._phi_knots[:, -1] + tail_x * self.tail_slope
+		derivative[~inside] = self.tail_slope
+		return x, phi, derivative
+
+	def quantile(self, p):
+		"""
+		Wealth at the ranks `p` in [0, 1] of every period.
+
+		Returns
+		-------
+		DataFrame
+			One row per period, one column per rank. Infinite at rank 1.
+		"""
+		x, phi, derivative = self.phi(p)
+		with np.errstate(over='ignore', invalid='ignore'):
+			quantiles = derivative * np.exp(x[:, np.newaxis] - phi)
+		quantiles[np.isinf(x)] = np.inf
+		return pd.DataFrame(quantiles.T, index=self.index, columns=pd.Index(np.atleast_1d(p), name='p'))
+
+	def top_share(self, p):
+		"""
+		Share of the total wealth held above the ranks `p` in [0, 1] of every period.
+
+		Returns
+		-------
+		DataFrame
+			One row per period, one column per rank.
+		"""
+		_, phi, _ = self.phi(p)
+		shares = np.exp(-phi) / self.mean.to_numpy()
+		return pd.DataFrame(shares.T, index=self.index, columns=pd.Index(np.atleast_1d(p), name='p'))
@@ -0,0 +1,212 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+def pareto_tail_scan(sorted_data, thresholds=None, upper=None, statistics=True, max_block_elements=4_000_000):
+	"""
+	Fits a Pareto tail above every candidate threshold of one sorted sample.
+
+	For a threshold x_m the tail is the data in [x_m, upper] and the Pareto scale is fixed at x_m, as in
+	`scipy.stats.pareto.fit(tail, floc=0, fscale=x_m)`. The MLE is then alpha = k / sum(log(x / x_m)), so
+	alpha and the log-likelihood of every threshold follow from suffix sums of log(x) in O(n). The SSE and
+	KS distance to the empirical CDF of each tail are computed in vectorized blocks over views of the same
+	sorted array, O(k) per threshold, without filtering, sorting or refitting.
+
+	Parameters
+	----------
+	sorted_data : array_like
+		Sample sorted in ascending order.
+	thresholds : array_like, optional
+		Candidate thresholds x_m. Defaults to every unique positive value of the sample.
+	upper : float, optional
+		Upper clamp of the tail, inclusive.
+	statistics : bool
+		Whether to compute the SSE and KS columns.
+	max_block_elements : int
+		Bound on the size of the intermediate arrays of the SSE/KS computation.
+
+	Returns
+	-------
+	DataFrame
+		One row per threshold with columns threshold, n_tail, alpha, log_likelihood, and if requested SSE and KS.
+	"""
+	x = np.asarray(sorted_data, dtype=float)
+	if upper is not None:
+		x = x[:np.searchsorted(x, upper, side='right')]
+	x = x[np.searchsorted(x, 0, side='right'):]
+
+	if thresholds is None:
+		thresholds = np.unique(x)
+	thresholds = np.asarray(thresholds, dtype=float)
+
+	n = len(x)
+	starts = np.searchsorted(x, thresholds, side='left')
+	n_tail = n - starts
+
+	# Suffix sums of log(x), S[j] = sum(log(x[j:]))
+	log_x = np.log(x)
+	suffix_log_sum = np.append(np.cumsum(log_x[::-1])[::-1], 0)
+	tail_log_sum = suffix_log_sum[starts]
+	log_thresholds = np.log(thresholds)
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		alpha = n_tail / (tail_log_sum - n_tail * log_thresholds)
+		log_likelihood = n_tail * np.log(alpha) + n_tail * alpha * log_thresholds - (alpha + 1) * tail_log_sum
+
+	scan = pd.DataFrame({
+		'threshold': thresholds,
+		'n_tail': n_tail,
+		'alpha': alpha,
+		'log_likelihood': log_likelihood,
+	})
+
+	if statistics:
+		scan['SSE'], scan['KS'] = _tail_statistics(x, thresholds, starts, alpha, max_block_elements)
+
+	return scan
+
+def _tail_statistics(x, thresholds, starts, alpha, max_block_elements):
+	# SSE and KS of each tail against its own empirical CDF, processed in blocks of thresholds
+	n = len(x)
+	sse = np.full(len(thresholds), np.nan)
+	ks = np.full(len(thresholds), np.nan)
+
+	order = np.argsort(starts)
+	block_start = 0
+	while block_start < len(order):
+		# Grow the block while the (thresholds x tail) matrix stays under the element budget
+		first_start = starts[order[block_start]]
+		width = max(n - first_start, 1)
+		block_size = max(1, max_block_elements // width)
+		block = order[block_start:block_start + block_size]
+		block_start += block_size
+
+		valid = block[(starts[block] < n) & np.isfinite(alpha[block])]
+		if len(valid) == 0:
+			continue
+
+		first = starts[valid].min()
+		tail = x[first:]
+		start = starts[valid][:, None]
+		k = (n - starts[valid])[:, None]
+
+		# Rank of each point within its tail, <= 0 outside of it
+		rank = np.arange(first, n)[None, :] - start + 1
+		in_tail = rank > 0
+		with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+			model_cdf = 1 - np.power(thresholds[valid][:, None] / tail[None, :], alpha[valid][:, None])
+		ecdf_upper = rank / k
+		ecdf_lower = (rank - 1) / k
+
+		# Points below the threshold have unbounded model CDFs, they are masked out
+		with np.errstate(over='ignore', invalid='ignore'):
+			sse[valid] = np.sum(np.where(in_tail, (ecdf_upper - model_cdf) ** 2, 0), axis=1)
+			ks[valid] = np.max(np.where(in_tail, np.maximum(ecdf_upper - model_cdf, model_cdf - ecdf_lower), -np.inf), axis=1)
+
+	return sse, ks
+
+def select_x_min(sorted_data, thresholds=None, upper=None, min_tail=50):
+	"""
+	Selects the lower bound x_min of a Pareto tail by minimizing the KS distance, as in Clauset, Shalizi and
+	Newman (2009).
+
+	Parameters
+	----------
+	sorted_data : array_like
+		Sample sorted in ascending order.
+	thresholds : array_like, optional
+		Candidate thresholds. Defaults to every unique positive value of the sample.
+	upper : float, optional
+		Upper clamp of the tail, inclusive.
+	min_tail : int
+		Smallest tail a candidate may leave, very short tails have a trivially small KS distance.
+
+	Returns
+	-------
+	best : Series
+		The scan row of the selected threshold.
+	scan : DataFrame
+		The `pareto_tail_scan` of all candidates.
+	"""
+	scan = pareto_tail_scan(sorted_data, thresholds, upper=upper)
+	candidates = scan['KS'].where(scan['n_tail'] >= min_tail)
+	if candidates.isna().all():
+		raise ValueError(f"No candidate threshold leaves a tail of at least {min_tail} points.")
+	return scan.loc[candidates.idxmin()], scan
+
+def pareto_tail_p_value(sorted_data, best, thresholds=None, upper=None, min_tail=50, n_replicates=1000, n_jobs=None, seed=None):
+	"""
+	Estimates the goodness-of-fit p-value of a Pareto tail with a semi-parametric bootstrap.
+
+	Each replicate redraws every point from the fitted Pareto above x_min with the observed tail probability,
+	and otherwise from the observed values below x_min. The replicate then goes through the same x_min
+	selection, so the p-value accounts for x_min having been chosen to fit. Replicates run in a process pool
+	whose initializer ships the sample once, each task only receives a seed.
+
+	Parameters
+	----------
+	sorted_data : array_like
+		Sample sorted in ascending order.
+	best : Series
+		Selected tail, e.g. the output of `select_x_min`.
+	thresholds, upper, min_tail
+		As passed to `select_x_min`. With `thresholds=None` every replicate scans its own unique values.
+	n_replicates : int
+		Number of bootstrap replicates.
+	n_jobs : int, optional
+		Number of worker processes. Defaults to the number of CPUs.
+	seed : int, optional
+		Seed for the replicates.
+
+	Returns
+	-------
+	p_value : float
+		Fraction of replicates with a KS distance at least as large as the observed one.
+	replicate_ks : ndarray
+		KS distance of the selected tail of each replicate, NaN where no candidate was long enough.
+	"""
+	x = np.asarray(sorted_data, dtype=float)
+	x = x[np.searchsorted(x, 0, side='right'):]
+	x_min, alpha = best['threshold'], best['alpha']
+
+	# Points above the upper clamp count towards the tail, the scan of each replicate drops them again
+	split = np.searchsorted(x, x_min, side='left')
+	body = x[:split]
+	tail_probability = (len(x) - split) / len(x)
+
+	replicate_seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+	initargs = (body, len(x), tail_probability, x_min, alpha, thresholds, upper, min_tail)
+	n_jobs = n_jobs or os.cpu_count()
+	chunksize = max(1, n_replicates // (4 * n_jobs))
+	with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_p_value_worker, initargs=initargs) as executor:
+		replicate_ks = np.array(list(executor.map(_p_value_replicate, replicate_seeds, chunksize=chunksize)))
+
+	# Replicates without a long enough tail are left out
+	valid = replicate_ks[~np.isnan(replicate_ks)]
+	return np.mean(valid >= best['KS']), replicate_ks
+
+# Per-process state of the p-value workers, set once by the pool initializer
+_p_value_state = {}
+
+def _init_p_value_worker(body, n, tail_probability, x_min, alpha, thresholds, upper, min_tail):
+	_p_value_state.update(
+		body=body, n=n, tail_probability=tail_probability, x_min=x_min, alpha=alpha,
+		thresholds=thresholds, upper=upper, min_tail=min_tail,
+	)
+
+def _p_value_replicate(seed):
+	state = _p_value_state
+	rng = np.random.default_rng(seed)
+
+	n_tail = rng.binomial(state['n'], state['tail_probability'])
+	# numpy's pareto is the Lomax distribution, shifted and scaled to a Pareto with scale x_min
+	tail = state['x_min'] * (1 + rng.pareto(state['alpha'], n_tail))
+	body = rng.choice(state['body'], state['n'] - n_tail)
+	sample = np.sort(np.concatenate([body, tail]))
+
+	try:
+		best, _ = select_x_min(sample, state['thresholds'], state['upper'], state['min_tail'])
+	except ValueError:
+		return np.nan
+	return best['KS']
@@ -0,0 +1,273 @@
+import contextlib
+import datetime
+import functools
+import json
+import os
+import re
+import resource
+import subprocess
+import threading
+import time
+import tracemalloc
+import numpy as np
+import matplotlib.figure
+from scipy.stats import lognorm, pareto
+from utils.dagum_generalized import DagumGeneralNetWealth
+from utils.figure_export import FigureExporter
+
+# Functions timed by default: (owner, attribute, name in the report)
+HOT_FUNCTIONS = (
+	(np, 'sort', 'np.sort'),
+	(pareto, 'fit', 'pareto.fit'),
+	(lognorm, 'fit', 'lognorm.fit'),
+	(DagumGeneralNetWealth, 'fit', 'DagumGeneralNetWealth.fit'),
+	(matplotlib.figure.Figure, 'tight_layout', 'Figure.tight_layout'),
+	(matplotlib.figure.Figure, 'savefig', 'Figure.savefig'),
+	(FigureExporter, 'save', 'FigureExporter.save'),
+)
+
+# Functions of the scripts themselves, timed once a cell defines them
+SCRIPT_FUNCTIONS = ('save_fig', 'notate_plot')
+
+class Profiler:
+	"""
+	Records wall time, CPU time and peak memory of named sections, and calls of hot functions.
+
+	Sections nest, e.g. the cells of a script and the functions called from them. Every section keeps
+	its own wall and CPU time; every function its call count and total times. Peak memory is the
+	largest memory traced by `tracemalloc` while a section is open, numpy arrays included, which
+	slows allocation-heavy code down. The nesting is also recorded as folded stacks weighted by self
+	time, the input format of flamegraph.pl and speedscope.
+
+		profiler = Profiler()
+		with profiler.patched(), profiler.section('fit'):
+			...
+		profiler.write('report.json', folded_path='report.folded')
+
+	Parameters
+	----------
+	trace_memory : bool
+		Record the peak memory of sections with `tracemalloc`.
+	"""
+
+	def __init__(self, trace_memory=True):
+		self.trace_memory = trace_memory
+		self.sections = {}
+		self.functions = {}
+		self.folded = {}
+		self.started = datetime.datetime.now(datetime.timezone.utc)
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	@contextlib.contextmanager
+	def section(self, name):
+		"""
+		Context manager timing the enclosed code as section `name`.
+		"""
+		frame = self._enter(name, memory=self.trace_memory)
+		try:
+			yield
+		finally:
+			wall, cpu, peak = self._exit(frame)
+			with self._lock:
+				stats = self.sections.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_memory': 0})
+				stats['calls'] += 1
+				stats['wall'] += wall
+				stats['cpu'] += cpu
+				stats['peak_memory'] = max(stats['peak_memory'], peak)
+
+	def wrap(self, function, name=None):
+		"""
+		Wraps `function` to count its calls and time them.
+		"""
+		name = name or getattr(function, '__qualname__', repr(function))
+
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			frame = self._enter(name, memory=False)
+			try:
+				return function(*args, **kwargs)
+			finally:
+				wall, cpu, _ = self._exit(frame)
+				with self._lock:
+					stats = self.functions.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+					stats['calls'] += 1
+					stats['wall'] += wall
+					stats['cpu'] += cpu
+		wrapper.__profiled__ = function
+		return wrapper
+
+	@contextlib.contextmanager
+	def patched(self, functions=HOT_FUNCTIONS):
+		"""
+		Context manager replacing functions by their wrapped versions, restored on exit.
+
+		Parameters
+		----------
+		functions : iterable of tuple
+			(owner, attribute, name) of every function, the owner being a module, class or instance.
+		"""
+		originals = []
+		try:
+			for owner, attribute, name in functions:
+				# Instances, e.g. scipy's distributions, get their bound method shadowed on the instance
+				had_own = attribute in getattr(owner, '__dict__', {})
+				original = getattr(owner, '__dict__', {}).get(attribute) if had_own else None
+				setattr(owner, attribute, self.wrap(getattr(owner, attribute), name))
+				originals.append((owner, attribute, had_own, original))
+			if self.trace_memory:
+				tracemalloc.start()
+			yield self
+		finally:
+			if self.trace_memory:
+				tracemalloc.stop()
+			for owner, attribute, had_own, original in reversed(originals):
+				if had_own:
+					setattr(owner, attribute, original)
+				else:
+					delattr(owner, attribute)
+
+	def report(self):
+		"""
+		The recorded statistics, as written by `write`.
+		"""
+		with self._lock:
+			return {
+				'started': self.started.isoformat(timespec='seconds'),
+				'commit': _git_commit(),
+				'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+				'sections': {name: dict(stats) for name, stats in self.sections.items()},
+				'functions': dict(sorted(((name, dict(stats)) for name, stats in self.functions.items()), key=lambda item: -item[1]['wall'])),
+			}
+
+	def write(self, path, folded_path=None):
+		"""
+		Writes the JSON report, and the folded stacks in microseconds of self time to `folded_path`.
+		"""
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		with open(path, 'w') as file:
+			json.dump(self.report(), file, indent=1)
+		if folded_path is not None:
+			with self._lock:
+				lines = [f'{stack} {round(seconds * 1e6)}' for stack, seconds in self.folded.items() if seconds >= 1e-6]
+			with open(folded_path, 'w') as file:
+				file.write('\n'.join(lines) + '\n')
+
+	def _enter(self, name, memory):
+		stack = self._stack()
+		if memory:
+			# Hand the peak so far to the enclosing sections before restarting it
+			peak = tracemalloc.get_traced_memory()[1]
+			for frame in stack:
+				frame['peak'] = max(frame['peak'], peak)
+			tracemalloc.reset_peak()
+		frame = {
+			'name': name.replace(';', ':').replace(' ', '_'),
+			'memory': memory,
+			'peak': 0,
+			'children': 0.0,
+			'wall': time.perf_counter(),
+			'cpu': time.process_time(),
+		}
+		stack.append(frame)
+		return frame
+
+	def _exit(self, frame):
+		wall = time.perf_counter() - frame['wall']
+		cpu = time.process_time() - frame['cpu']
+		stack = self._stack()
+
+		peak = 0
+		if frame['memory'] and tracemalloc.is_tracing():
+			peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+		path = ';'.join(entry['name'] for entry in stack)
+		stack.pop()
+		if stack:
+			stack[-1]['children'] += wall
+			stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+
+		with self._lock:
+			self.folded[path] = self.folded.get(path, 0.0) + wall - frame['children']
+		return wall, cpu, peak
+
+	def _stack(self):
+		if not hasattr(self._local, 'stack'):
+			self._local.stack = []
+		return self._local.stack
+
+def split_cells(source):
+	"""
+	Splits the source of a `# %%` script into cells.
+
+	Returns
+	-------
+	list of tuple
+		(title, first line number, source) of every cell. The title is the first comment line of the cell.
+	"""
+	lines = source.splitlines(keepends=True)
+	starts = [i for i, line in enumerate(lines) if line.strip().startswith(('# %%', '#%%'))]
+	if not starts or starts[0] != 0:
+		starts.insert(0, 0)
+
+	cells = []
+	for start, end in zip(starts, starts[1:] + [len(lines)]):
+		cell_lines = lines[start:end]
+		title = next((line.strip().lstrip('#').strip() for line in cell_lines[1:] if re.match(r'\s*#\s*\w', line)), f'cell at line {start + 1}')
+		cells.append((title, start + 1, ''.join(cell_lines)))
+	return cells
+
+def run_script(path, profiler, functions=SCRIPT_FUNCTIONS):
+	"""
+	Runs a `# %%` script cell by cell, each as a profiler section named after its title.
+
+	The cells share one namespace and keep their line numbers, so tracebacks and the cell caching of
+	`FigureExporter.restore` behave as when the script is run directly. The script functions listed in
+	`functions` are wrapped as soon as a cell defines them.
+	"""
+	with open(path) as file:
+		source = file.read()
+
+	namespace = {'__name__': '__main__', '__file__': path}
+	for title, first_line, cell_source in split_cells(source):
+		# Pad with newlines so the compiled cell keeps its line numbers
+		code = compile('\n' * (first_line - 1) + cell_source, path, 'exec')
+		with profiler.section(title):
+			exec(code, namespace)
+
+		for name in functions:
+			function = namespace.get(name)
+			if callable(function) and not hasattr(function, '__profiled__'):
+				namespace[name] = profiler.wrap(function, name)
+	return namespace
+
+def compare_reports(report, baseline, threshold=1.2):
+	"""
+	Lines comparing the section wall times of two reports, flagging ratios beyond `threshold`.
+	"""
+	lines = []
+	for name, stats in report['sections'].items():
+		if name not in baseline['sections'] or baseline['sections'][name]['wall'] <= 0:
+			continue
+		ratio = stats['wall'] / baseline['sections'][name]['wall']
+		flag = 'slower' if ratio > threshold else 'faster' if ratio < 1 / threshold else ''
+		lines.append(f'{name[:48]:<50}{ratio:>8.2f}x  {flag}')
+	return lines
+
+def format_report(report, limit=15):
+	"""
+	Lines of a text summary of a report, its sections in order and its slowest functions.
+	"""
+	lines = [f'{"section":<50}{"wall":>10}{"cpu":>10}{"peak MB":>10}']
+	for name, stats in report['sections'].items():
+		lines.append(f'{name[:48]:<50}{stats["wall"]:>9.2f}s{stats["cpu"]:>9.2f}s{stats["peak_memory"] / 1024**2:>10.1f}')
+	lines.append('')
+	lines.append(f'{"function":<50}{"wall":>10}{"cpu":>10}{"calls":>10}')
+	for name, stats in list(report['functions'].items())[:limit]:
+		lines.append(f'{name[:48]:<50}{stats["wall"]:>9.2f}s{stats["cpu"]:>9.2f}s{stats["calls"]:>10}')
+	return lines
+
+def _git_commit():
+	try:
+		return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
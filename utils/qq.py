@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from utils.dagum_generalized import DagumGeneralNetWealth
+from utils.decimate import log_decade_indices
+
+class FrozenDagum:
+	"""
+	A Dagum Generalized distribution with fixed parameters, exposing `cdf` and `ppf` like a frozen scipy distribution.
+
+	Parameters
+	----------
+	params : tuple of float
+		(b1, b2, c, l, s, beta, delta), e.g. the output of `DagumGeneralNetWealth.fit`.
+	scale : float
+		Unit of the data the parameters were fitted to, e.g. 1_000_000 for a fit in millions.
+	"""
+
+	def __init__(self, params, scale=1):
+		self.model = DagumGeneralNetWealth()
+		self.params = tuple(params)
+		self.scale = scale
+
+	def cdf(self, x):
+		return self.model.cdf(np.asarray(x, dtype=float) / self.scale, *self.params)
+
+	def ppf(self, p):
+		return self.model.ppf(p, *self.params) * self.scale
+
+def plotting_positions(n, a=0.5):
+	"""
+	Plotting positions (i - a) / (n + 1 - 2a) of the i-th of n order statistics, Hazen's by default.
+	"""
+	return (np.arange(1, n + 1) - a) / (n + 1 - 2 * a)
+
+def quantile_quantile(sorted_data, models, support=None, points_per_decade=50, a=0.5):
+	"""
+	Computes the Q-Q comparison of a sorted sample against several models.
+
+	The theoretical quantiles of every model are evaluated at one shared vector of plotting positions. With
+	`support`, the models are conditioned on the clamp the sample was taken from, so a sample clamped to
+	[lower, upper] is compared against the models' quantiles within the same range.
+
+	Parameters
+	----------
+	sorted_data : array_like
+		Sample sorted in ascending order.
+	models : dict
+		Name to distribution, any object with vectorized `cdf` and `ppf` methods: frozen scipy distributions
+		such as `pareto(alpha, scale=x_m)` and `lognorm(sigma, scale=np.exp(mu))`, or `FrozenDagum`.
+	support : tuple of float, optional
+		(lower, upper) clamp of the sample.
+	points_per_decade : int
+		Points per decade of the empirical quantiles kept for plotting, see `log_decade_indices`.
+	a : float
+		Plotting position parameter, see `plotting_positions`.
+
+	Returns
+	-------
+	quantiles : DataFrame
+		Full resolution quantiles indexed by plotting position, an 'Empirical' column and one column per model.
+	deviations : DataFrame
+		Full resolution theoretical minus empirical quantiles, one column per model.
+	plot_indices : ndarray
+		Rows of `quantiles` to draw.
+	"""
+	sorted_data = np.asarray(sorted_data, dtype=float)
+	positions = plotting_positions(len(sorted_data), a)
+
+	quantiles = pd.DataFrame({'Empirical': sorted_data}, index=pd.Index(positions, name='p'))
+	for name, model in models.items():
+		quantiles[name] = model.ppf(_conditional_positions(model, positions, support))
+
+	deviations = quantiles[list(models)].sub(quantiles['Empirical'], axis=0)
+	return quantiles, deviations, log_decade_indices(sorted_data, points_per_decade)
+
+def probability_probability(sorted_data, models, support=None, points_per_decade=50, a=0.5):
+	"""
+	Computes the P-P comparison of a sorted sample against several models.
+
+	Parameters
+	----------
+	sorted_data, models, support, points_per_decade, a
+		See `quantile_quantile`.
+
+	Returns
+	-------
+	probabilities : DataFrame
+		Full resolution probabilities indexed by the sample, an 'Empirical' column with the plotting
+		positions and one column per model with its CDF, conditioned on `support`.
+	deviations : DataFrame
+		Full resolution model minus empirical probabilities, one column per model.
+	plot_indices : ndarray
+		Rows of `probabilities` to draw.
+	"""
+	sorted_data = np.asarray(sorted_data, dtype=float)
+	positions = plotting_positions(len(sorted_data), a)
+
+	probabilities = pd.DataFrame({'Empirical': positions}, index=pd.Index(sorted_data, name='x'))
+	for name, model in models.items():
+		cdf = model.cdf(sorted_data)
+		if support is not None:
+			lower, upper = model.cdf(np.asarray(support, dtype=float))
+			cdf = (cdf - lower) / (upper - lower)
+		probabilities[name] = cdf
+
+	deviations = probabilities[list(models)].sub(probabilities['Empirical'], axis=0)
+	return probabilities, deviations, log_decade_indices(sorted_data, points_per_decade)
+
+def _conditional_positions(model, positions, support):
+	# Maps positions of the clamped sample to positions of the full model
+	if support is None:
+		return positions
+	lower, upper = model.cdf(np.asarray(support, dtype=float))
+	return lower + positions * (upper - lower)
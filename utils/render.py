@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import numpy as np
+import matplotlib as mpl
+import matplotlib.animation as animation
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+def open_video_pipe(path, width, height, fps):
+	"""
+	Starts an ffmpeg process encoding raw RGBA frames written to its stdin into an H.264 video.
+
+	Parameters
+	----------
+	path : str
+		Output video file.
+	width, height : int
+		Frame size in pixels.
+	fps : float
+		Frame rate of the video.
+
+	Returns
+	-------
+	subprocess.Popen
+		The encoder process. Write frames of height * width * 4 bytes to its stdin.
+	"""
+	command = [
+		mpl.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+		'-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(fps), '-i', 'pipe:',
+		# yuv420p needs even dimensions
+		'-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+		'-vcodec', 'libx264', '-pix_fmt', 'yuv420p', path,
+	]
+	return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+def close_video_pipe(process):
+	process.stdin.close()
+	if process.wait() != 0:
+		raise Exception(f"ffmpeg exited with code {process.returncode}")
+
+def render_blitted(fig, artists, update, frames, path, fps, dpi=None):
+	"""
+	Renders an animation by drawing the static parts of the figure once and only the changing artists per frame.
+
+	`update(frame)` should only change the data, text or properties of `artists`, not limits, scales or
+	layout. The static background is rendered once, every frame restores it, draws the animated artists
+	on top and pipes the raw buffer straight into ffmpeg. Without ffmpeg it falls back to a blitted
+	`FuncAnimation` saved through the default writer.
+
+	Parameters
+	----------
+	fig : Figure
+		Figure with the artists already created, laid out and annotated.
+	artists : list of Artist
+		The artists `update` modifies.
+	update : callable
+		Called with each frame before it is drawn.
+	frames : iterable
+		Frames passed to `update`.
+	path : str
+		Output video file.
+	fps : float
+		Frame rate of the video.
+	dpi : float, optional
+		Resolution of the video frames. Defaults to rcParams['savefig.dpi'], as `Animation.save`.
+	"""
+	if dpi is None:
+		dpi = mpl.rcParams['savefig.dpi']
+	if dpi == 'figure':
+		dpi = fig.dpi
+
+	if not animation.writers.is_available('ffmpeg'):
+		def blit_update(frame):
+			update(frame)
+			return artists
+		anim = animation.FuncAnimation(fig, blit_update, frames=frames, blit=True, interval=1000 / fps)
+		anim.save(path, fps=fps, dpi=dpi)
+		return
+
+	original_dpi = fig.dpi
+	fig.set_dpi(dpi)
+	for artist in artists:
+		artist.set_animated(True)
+
+	try:
+		# Render the static background once
+		canvas = fig.canvas
+		canvas.draw()
+		background = canvas.copy_from_bbox(fig.bbox)
+		height, width = np.asarray(canvas.buffer_rgba()).shape[:2]
+
+		process = open_video_pipe(path, width, height, fps)
+		try:
+			for frame in frames:
+				update(frame)
+				canvas.restore_region(background)
+				for artist in artists:
+					fig.draw_artist(artist)
+				process.stdin.write(canvas.buffer_rgba())
+		finally:
+			close_video_pipe(process)
+	finally:
+		for artist in artists:
+			artist.set_animated(False)
+		fig.set_dpi(original_dpi)
+
+# Figure factory and update function of the segmented render, inherited by the forked workers
+_segment_state = {}
+
+def render_segmented(make_figure, update, frames, path, fps, jobs=None, dpi=None):
+	"""
+	Renders an animation in parallel by splitting the frames into contiguous segments.
+
+	Each worker process builds its own figure with `make_figure`, renders its segment on an Agg canvas
+	and pipes the frames into its own ffmpeg encoder. The segment videos are then concatenated without
+	re-encoding. Workers are forked so that `make_figure` and `update` may be closures or script
+	globals; where fork is unavailable the frames are rendered serially.
+
+	Parameters
+	----------
+	make_figure : callable
+		Returns `(fig, fargs)`, a new figure and the extra arguments passed to `update`.
+	update : callable
+		Called as `update(frame, *fargs)` to draw each frame.
+	frames : iterable
+		Frames passed to `update`.
+	path : str
+		Output video file.
+	fps : float
+		Frame rate of the video.
+	jobs : int, optional
+		Number of worker processes. Defaults to the number of CPUs.
+	dpi : float, optional
+		Resolution of the video frames. Defaults to rcParams['savefig.dpi'].
+	"""
+	frames = list(frames)
+	if dpi is None:
+		dpi = mpl.rcParams['savefig.dpi']
+	jobs = min(jobs or os.cpu_count(), len(frames))
+
+	_segment_state.update(make_figure=make_figure, update=update, fps=fps, dpi=dpi)
+	if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+		_render_segment(frames, path)
+		return
+
+	segments = [list(segment) for segment in np.array_split(np.arange(len(frames)), jobs)]
+	with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp_directory:
+		segment_paths = [os.path.join(tmp_directory, f'segment_{i}.mp4') for i in range(len(segments))]
+		with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as executor:
+			futures = [
+				executor.submit(_render_segment, [frames[i] for i in segment], segment_path)
+				for segment, segment_path in zip(segments, segment_paths)
+			]
+			for future in futures:
+				future.result()
+
+		# Concatenate the segments without re-encoding
+		list_path = os.path.join(tmp_directory, 'segments.txt')
+		with open(list_path, 'w') as file:
+			file.writelines(f"file '{segment_path}'\n" for segment_path in segment_paths)
+		subprocess.run([
+			mpl.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+			'-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy', path,
+		], check=True)
+
+def _render_segment(frames, path):
+	state = _segment_state
+	fig, fargs = state['make_figure']()
+	canvas = FigureCanvasAgg(fig)
+	fig.set_dpi(state['dpi'])
+	canvas.draw()
+	height, width = np.asarray(canvas.buffer_rgba()).shape[:2]
+
+	process = open_video_pipe(path, width, height, state['fps'])
+	try:
+		for frame in frames:
+			state['update'](frame, *fargs)
+			canvas.draw()
+			process.stdin.write(canvas.buffer_rgba())
+	finally:
+		close_video_pipe(process)
+		plt.close(fig)
@@ -0,0 +1,213 @@
+import inspect
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+class Section:
+	"""
+	A unit of an analysis: a function of named inputs producing named outputs.
+
+	Parameters
+	----------
+	name : str
+		Name of the section, usable as a target.
+	function : callable
+		Called with one keyword argument per input. Returns a single value for one output, a tuple for
+		several, and anything (ignored) for none.
+	outputs : tuple of str
+		Names of the values the section produces.
+	plots : bool
+		Whether the section uses pyplot, whose global state is not thread-safe.
+	"""
+
+	def __init__(self, name, function, outputs, plots):
+		self.name = name
+		self.function = function
+		self.inputs = tuple(inspect.signature(function).parameters)
+		self.outputs = tuple(outputs)
+		self.plots = plots
+
+class SectionGraph:
+	"""
+	Registry of sections wired together by the names of their inputs and outputs.
+
+	Inputs are the parameter names of the section functions; every input is either the output of
+	exactly one section or a parameter given to the runner, e.g. the year.
+
+		sections = SectionGraph()
+
+		@sections.section(outputs=('wealth_sample',))
+		def wealth_sample(psid_data, year):
+			...
+	"""
+
+	def __init__(self):
+		self.sections = {}
+		self.producers = {}
+
+	def section(self, outputs=(), plots=False):
+		"""
+		Decorator registering a function as a section.
+		"""
+		def register(function):
+			section = Section(function.__name__, function, outputs, plots)
+			if section.name in self.sections:
+				raise ValueError(f"Section {section.name} is already defined.")
+			for output in section.outputs:
+				if output in self.producers:
+					raise ValueError(f"Output {output} of {section.name} is already produced by {self.producers[output].name}.")
+				self.producers[output] = section
+			self.sections[section.name] = section
+			return function
+		return register
+
+	def runner(self, **parameters):
+		"""
+		Creates a runner with the given parameters and an empty memo.
+		"""
+		return SectionRunner(self, parameters)
+
+	def dependencies(self, targets, available=()):
+		"""
+		Sections needed for the targets, in a topological order.
+
+		Parameters
+		----------
+		targets : iterable of str
+			Section or output names.
+		available : iterable of str
+			Values already known, whose producers are not needed.
+		"""
+		available = set(available)
+		order = []
+		visiting = set()
+		done = set()
+
+		def visit(section):
+			if section.name in done:
+				return
+			if section.name in visiting:
+				raise ValueError(f"Sections form a cycle through {section.name}.")
+			visiting.add(section.name)
+			for name in section.inputs:
+				if name not in available:
+					visit(self._producer(name, section.name))
+			visiting.discard(section.name)
+			done.add(section.name)
+			order.append(section)
+
+		for target in targets:
+			if target in self.sections:
+				visit(self.sections[target])
+			elif target not in available:
+				visit(self._producer(target, None))
+		return order
+
+	def independent(self, targets, parameters, varying):
+		"""
+		Sections needed for the targets that depend on none of the `varying` parameters, in a topological order.
+
+		Their outputs are the same for every value of the varying parameters, so they can run once and be
+		given to the runners of each value, e.g. the data loaded for several years.
+
+		Parameters
+		----------
+		targets : iterable of str
+			Section or output names.
+		parameters : iterable of str
+			Names of all the parameters given to the runners.
+		varying : iterable of str
+			Names of the parameters that differ between the runners.
+		"""
+		dependent = set(varying)
+		independent = []
+		for section in self.dependencies(targets, parameters):
+			if dependent.intersection(section.inputs):
+				dependent.update(section.outputs)
+			else:
+				independent.append(section)
+		return independent
+
+	def _producer(self, name, consumer):
+		if name not in self.producers:
+			needed_by = f" needed by {consumer}" if consumer else ""
+			raise KeyError(f"No section produces {name}{needed_by}, and it was not given as a parameter.")
+		return self.producers[name]
+
+class SectionRunner:
+	"""
+	Runs the sections of a graph for one set of parameters, memoizing every output.
+
+	Sections whose inputs are available run concurrently in a thread pool; numpy, scipy and the
+	process pools of the estimators release the GIL for their heavy work. Sections that plot run
+	one at a time under a shared lock, as pyplot keeps global state.
+	"""
+
+	# Shared by all runners, they may drive pyplot from the same process
+	plot_lock = threading.Lock()
+
+	def __init__(self, graph, parameters):
+		self.graph = graph
+		self.values = dict(parameters)
+		self.timings = {}
+		self._completed = set()
+
+	def run(self, targets, jobs=1):
+		"""
+		Runs the sections needed for the targets that have not run yet.
+
+		Parameters
+		----------
+		targets : iterable of str
+			Section or output names.
+		jobs : int
+			Number of sections run at the same time.
+
+		Returns
+		-------
+		dict
+			All values known to the runner, parameters and outputs.
+		"""
+		pending = [section for section in self.graph.dependencies(targets, self.values) if section.name not in self._completed]
+		running = {}
+		with ThreadPoolExecutor(max_workers=jobs) as executor:
+			while pending or running:
+				# Start every section whose inputs are known
+				for section in [section for section in pending if all(name in self.values for name in section.inputs)]:
+					if len(running) >= jobs:
+						break
+					pending.remove(section)
+					running[executor.submit(self._run_section, section)] = section
+
+				if not running:
+					missing = {name for section in pending for name in section.inputs if name not in self.values}
+					raise RuntimeError(f"Sections {[section.name for section in pending]} are waiting on {sorted(missing)}.")
+
+				finished, _ = wait(running, return_when=FIRST_COMPLETED)
+				for future in finished:
+					section = running.pop(future)
+					# Re-raises the section's exception
+					outputs = future.result()
+					self.values.update(zip(section.outputs, outputs))
+					self._completed.add(section.name)
+		return self.values
+
+	def _run_section(self, section):
+		arguments = {name: self.values[name] for name in section.inputs}
+		if section.plots:
+			with self.plot_lock:
+				result = self._timed(section, arguments)
+		else:
+			result = self._timed(section, arguments)
+
+		if len(section.outputs) == 0:
+			return ()
+		if len(section.outputs) == 1:
+			return (result,)
+		return tuple(result)
+
+	def _timed(self, section, arguments):
+		start = time.perf_counter()
+		result = section.function(**arguments)
+		self.timings[section.name] = time.perf_counter() - start
+		return result
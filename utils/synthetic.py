@@ -0,0 +1,147 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.special import ndtr
+from utils.dagum_generalized import DagumGeneralNetWealth
+
+# Biennial waves of the PSID since 1999
+BIENNIAL_YEARS = tuple(str(year) for year in range(1999, 2021, 2))
+
+# Dagum fit of the 2019 PSID wave in millions: negative mass, an atom at zero and a heavy tail
+DAGUM_PARAMS = (2.03783141e-01, 8.73657266e-02, 9.90708208e+00, 8.81972201e+03, 6.84661991e-01, 2.48950254e-02, 8.96540606e+00)
+
+# Share of households with 1 to 7 members, roughly the CPS household size distribution
+HOUSEHOLD_SIZE_SHARES = (0.28, 0.35, 0.15, 0.13, 0.06, 0.02, 0.01)
+
+# PSID column to the file of its values in every year directory
+COLUMN_FILES = {
+	'FAMILY ID': 'family_id.npy',
+	'IMP WEALTH W/ EQUITY': 'imp_wealth.npy',
+	'ACC WEALTH W/ EQUITY': 'acc_wealth.npy',
+	'# IN FU': 'family_size.npy',
+}
+COLUMN_DTYPES = {
+	'FAMILY ID': np.int64,
+	'IMP WEALTH W/ EQUITY': np.float64,
+	'ACC WEALTH W/ EQUITY': np.int8,
+	'# IN FU': np.int8,
+}
+
+def generate_population(directory, households, years=BIENNIAL_YEARS, params=DAGUM_PARAMS, scale=1_000_000, persistence=0.8, annual_growth=0.0, chunk_size=1_000_000, n_jobs=None, seed=None):
+	"""
+	Generates a synthetic household wealth panel in the layout of `PSIDData`.
+
+	Every household is followed through all waves. Its wealth rank moves between waves as a Gaussian AR(1)
+	with correlation `persistence`, and each wave maps the ranks through the Dagum Generalized quantile
+	function, so the marginal of every wave has the negative mass, the atom at zero and the heavy tail of
+	`params`. Family sizes are drawn once per household from `HOUSEHOLD_SIZE_SHARES`, for the equivalence
+	scale adjustment of the loader.
+
+	The columns of every wave are `.npy` files preallocated on disk. Chunks of households are generated in
+	a process pool and written straight into the memory-mapped files, so the population never has to fit
+	in memory and 10^9 household-waves take a few tens of gigabytes of disk. Each chunk has its own seed,
+	so the output does not depend on the number of workers. Load it with `data.SyntheticPSIDData`.
+
+	Parameters
+	----------
+	directory : str
+		Output directory, one subdirectory per year and a population.json description.
+	households : int
+		Number of households in every wave.
+	years : iterable of str
+		Waves to generate.
+	params : tuple of float
+		(b1, b2, c, l, s, beta, delta) of the wealth distribution, in units of `scale`.
+	scale : float
+		Dollars per unit of `params`.
+	persistence : float
+		Correlation of the latent wealth rank between consecutive waves.
+	annual_growth : float
+		Growth of all wealth per year after the first wave.
+	chunk_size : int
+		Households per task.
+	n_jobs : int, optional
+		Number of worker processes. Defaults to the number of CPUs.
+	seed : int, optional
+		Seed of the population.
+
+	Returns
+	-------
+	dict
+		The description written to population.json.
+	"""
+	years = [str(year) for year in years]
+	growth_factors = [(1 + annual_growth) ** (int(year) - int(years[0])) for year in years]
+
+	for year in years:
+		os.makedirs(os.path.join(directory, year), exist_ok=True)
+		for column, file_name in COLUMN_FILES.items():
+			# Preallocate the file, the workers fill it in place
+			np.lib.format.open_memmap(os.path.join(directory, year, file_name), mode='w+', dtype=COLUMN_DTYPES[column], shape=(households,)).flush()
+
+	starts = range(0, households, chunk_size)
+	chunk_seeds = np.random.SeedSequence(seed).spawn(len(starts))
+	tasks = [(start, min(start + chunk_size, households), chunk_seed) for start, chunk_seed in zip(starts, chunk_seeds)]
+
+	initargs = (directory, years, tuple(params), scale, persistence, growth_factors)
+	with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(), initializer=_init_generate_worker, initargs=initargs) as executor:
+		# Re-raises the first error of a chunk
+		list(executor.map(_generate_chunk, tasks))
+
+	description = {
+		'households': households,
+		'years': years,
+		'params': list(params),
+		'scale': scale,
+		'persistence': persistence,
+		'annual_growth': annual_growth,
+		'seed': seed,
+		'columns': COLUMN_FILES,
+	}
+	with open(os.path.join(directory, 'population.json'), 'w') as file:
+		json.dump(description, file, indent=1)
+	return description
+
+# Per-process state of the generating workers, set once by the pool initializer
+_generate_state = {}
+
+def _init_generate_worker(directory, years, params, scale, persistence, growth_factors):
+	columns = {
+		year: {column: np.load(os.path.join(directory, year, file_name), mmap_mode='r+') for column, file_name in COLUMN_FILES.items()}
+		for year in years
+	}
+	_generate_state.update(
+		columns=columns, years=years, params=params, scale=scale,
+		persistence=persistence, growth_factors=growth_factors, model=DagumGeneralNetWealth(),
+	)
+
+def _generate_chunk(task):
+	start, stop, seed = task
+	state = _generate_state
+	rng = np.random.default_rng(seed)
+	n = stop - start
+
+	family_ids = np.arange(start + 1, stop + 1, dtype=np.int64)
+	family_sizes = rng.choice(np.arange(1, len(HOUSEHOLD_SIZE_SHARES) + 1), size=n, p=HOUSEHOLD_SIZE_SHARES).astype(np.int8)
+
+	# Latent standard normal rank of every household, an AR(1) across waves
+	innovation_scale = np.sqrt(1 - state['persistence']**2)
+	latent = rng.standard_normal(n)
+	for i, (year, growth_factor) in enumerate(zip(state['years'], state['growth_factors'])):
+		if i > 0:
+			latent = state['persistence'] * latent + innovation_scale * rng.standard_normal(n)
+		# Keep the probabilities off 0 and 1, where the quantiles are infinite
+		p = np.clip(ndtr(latent), np.finfo(float).tiny, np.nextafter(1, 0))
+		wealth = np.round(state['model'].ppf(p, *state['params']) * state['scale'] * growth_factor)
+
+		columns = state['columns'][year]
+		columns['FAMILY ID'][start:stop] = family_ids
+		columns['IMP WEALTH W/ EQUITY'][start:stop] = wealth
+		# Every value is "imputed" by the model, accuracy code 0 as for reported values in the PSID
+		columns['ACC WEALTH W/ EQUITY'][start:stop] = 0
+		columns['# IN FU'][start:stop] = family_sizes
+
+	for columns in state['columns'].values():
+		for values in columns.values():
+			values.flush()
@@ -0,0 +1,94 @@
+import numpy as np
+
+class WealthSample:
+	"""
+	A wealth sample sorted once, answering clamped-range selections with binary searches.
+
+	Selections, counts and empirical CDFs of a range [lower, upper] are contiguous slices of the sorted
+	array, found with `np.searchsorted` in O(log n) instead of building a boolean mask and re-sorting.
+	The returned arrays are read-only views shared between calls.
+
+	By default a range excludes its lower bound and includes its upper bound, matching the
+	`arr[(arr > m) & (arr <= n)]` clamps of the analysis scripts.
+
+	Parameters
+	----------
+	values : array_like
+		The sample, in any order. NaNs are dropped.
+	"""
+
+	def __init__(self, values):
+		values = np.asarray(values, dtype=float)
+		self.values = np.sort(values[~np.isnan(values)])
+		self.values.flags.writeable = False
+
+		# Ranks 1..n, shared by the empirical CDF of every range
+		self._ranks = np.arange(1, len(self.values) + 1, dtype=float)
+		self._ecdf_cache = {}
+
+	@classmethod
+	def from_psid(cls, psid_data, column='IMP WEALTH W/ EQUITY'):
+		"""
+		Builds one sample per year from loaded PSID data.
+
+		Parameters
+		----------
+		psid_data : PSIDData
+			Loaded PSID data.
+		column : str
+			Wealth column of the household data.
+
+		Returns
+		-------
+		dict
+			Year to WealthSample.
+		"""
+		return {year: cls(df[column]) for year, df in psid_data.get_household_wealth_data().items()}
+
+	def __len__(self):
+		return len(self.values)
+
+	def bounds(self, lower=None, upper=None, lower_inclusive=False, upper_inclusive=True):
+		"""
+		Index range [start, end) of the sorted values inside [lower, upper].
+		"""
+		start = 0 if lower is None else np.searchsorted(self.values, lower, side='left' if lower_inclusive else 'right')
+		end = len(self.values) if upper is None else np.searchsorted(self.values, upper, side='right' if upper_inclusive else 'left')
+		return start, max(start, end)
+
+	def select(self, lower=None, upper=None, lower_inclusive=False, upper_inclusive=True):
+		"""
+		Sorted values inside [lower, upper], as a view.
+		"""
+		start, end = self.bounds(lower, upper, lower_inclusive, upper_inclusive)
+		return self.values[start:end]
+
+	def count(self, lower=None, upper=None, lower_inclusive=False, upper_inclusive=True):
+		start, end = self.bounds(lower, upper, lower_inclusive, upper_inclusive)
+		return end - start
+
+	def inclusion_ratio(self, lower=None, upper=None, lower_inclusive=False, upper_inclusive=True):
+		"""
+		Fraction of the whole sample inside [lower, upper].
+		"""
+		return self.count(lower, upper, lower_inclusive, upper_inclusive) / len(self.values)
+
+	def ecdf(self, lower=None, upper=None, lower_inclusive=False, upper_inclusive=True):
+		"""
+		Empirical CDF of the values inside [lower, upper], normalized over that range.
+
+		Returns
+		-------
+		sorted_data : ndarray
+			Sorted values of the range, a view.
+		cdf_values : ndarray
+			i / k for the i-th of the k values, cached per range size.
+		"""
+		start, end = self.bounds(lower, upper, lower_inclusive, upper_inclusive)
+		k = end - start
+		cdf_values = self._ecdf_cache.get(k)
+		if cdf_values is None:
+			cdf_values = self._ranks[:k] / max(k, 1)
+			cdf_values.flags.writeable = False
+			self._ecdf_cache[k] = cdf_values
+		return self.values[start:end], cdf_values